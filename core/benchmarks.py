@@ -0,0 +1,257 @@
+import gc
+import io
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from core.cache import DASHBOARD_STATS_KEY, invalidate_prediction_statistics
+from students.models import Student, Course
+from students.services import CSVImportService
+from predictions.engine import PredictionEngine
+from predictions.models import Prediction
+from predictions.reports import PredictionReportGenerator
+
+# Registered benchmarks, in run order: name -> setup(context) returning the callable to time
+BENCHMARKS = {}
+
+# Benchmarks that write to the database; they run inside a rolled-back transaction
+WRITING_BENCHMARKS = set()
+
+# Students scored per run of the predict_cgpa benchmark
+PREDICT_SAMPLE_SIZE = 20
+
+# Upper bound on rows in the generated results CSV
+CSV_MAX_ROWS = 20000
+
+def benchmark(name, writes=False):
+    """Register a setup function; setup work is not timed"""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        if writes:
+            WRITING_BENCHMARKS.add(name)
+        return setup
+    return register
+
+def build_context():
+    """Objects shared by the benchmarks, loaded once per dataset"""
+    # Never saved: force_authenticate only needs the permission flags
+    user = get_user_model()(username='benchmark', is_staff=True, is_superuser=True)
+    client = APIClient()
+    client.force_authenticate(user)
+    return {
+        'client': client,
+        'student_ids': list(
+            Student.objects.filter(factors__isnull=False).order_by('pk')
+            .values_list('student_id', flat=True)[:PREDICT_SAMPLE_SIZE]
+        ),
+    }
+
+def measure(run, repeats):
+    """
+    Time `run` over `repeats` plain runs, then run it once more under
+    tracemalloc and query capture so neither skews the timings
+    """
+    timings = []
+    for _ in range(repeats):
+        gc.collect()
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    
+    gc.collect()
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as captured:
+            run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    
+    return {
+        'median_seconds': round(statistics.median(timings), 6),
+        'min_seconds': round(min(timings), 6),
+        'max_seconds': round(max(timings), 6),
+        'queries': len(captured),
+        'peak_memory_bytes': peak,
+        'repeats': repeats,
+    }
+
+def run_benchmarks(repeats, only=None, read_only=False):
+    """
+    Run every registered benchmark (or those named in `only`) against the
+    current database. Writing benchmarks are rolled back afterwards, and
+    skipped altogether when `read_only` is set.
+    """
+    context = build_context()
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        if read_only and name in WRITING_BENCHMARKS:
+            results[name] = {'skipped': 'writes to the database'}
+            continue
+        with rolled_back(name in WRITING_BENCHMARKS):
+            run = setup(context)
+            if run is None:
+                results[name] = {'skipped': 'no data for this benchmark'}
+                continue
+            results[name] = measure(run, repeats)
+            teardown = getattr(run, 'teardown', None)
+            if teardown:
+                teardown()
+    return results
+
+@contextmanager
+def rolled_back(enabled):
+    """Discard every database write made in the block"""
+    if not enabled:
+        yield
+        return
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+def compare(results, baseline, threshold):
+    """
+    Regressions of `results` against `baseline`, both {scale: {benchmark: metrics}}.
+    Time and memory regress when they grow by more than `threshold` (a fraction);
+    query counts regress on any increase.
+    """
+    regressions = []
+    for scale, benchmarks in results.items():
+        for name, metrics in benchmarks.items():
+            previous = baseline.get(scale, {}).get(name)
+            if not previous or 'skipped' in metrics or 'skipped' in previous:
+                continue
+            for metric, allowed in (
+                ('median_seconds', previous['median_seconds'] * (1 + threshold)),
+                ('peak_memory_bytes', previous['peak_memory_bytes'] * (1 + threshold)),
+                ('queries', previous['queries']),
+            ):
+                if metrics[metric] > allowed:
+                    regressions.append({
+                        'scale': scale,
+                        'benchmark': name,
+                        'metric': metric,
+                        'baseline': previous[metric],
+                        'current': metrics[metric],
+                    })
+    return regressions
+
+@benchmark('engine.predict_cgpa', writes=True)
+def predict_single(context):
+    student_ids = context['student_ids']
+    if not student_ids:
+        return None
+    
+    def run():
+        for student_id in student_ids:
+            PredictionEngine.predict_cgpa(student_id)
+    return run
+
+@benchmark('engine.predict_cohort', writes=True)
+def predict_cohort(context):
+    return lambda: PredictionEngine.predict_cohort(Student.objects.all())
+
+@benchmark('engine.get_prediction_statistics')
+def prediction_statistics(context):
+    """Cache miss: the statistics are aggregated on every run"""
+    def run():
+        invalidate_prediction_statistics()
+        PredictionEngine.get_prediction_statistics()
+    return run
+
+@benchmark('engine.get_prediction_statistics_cached')
+def prediction_statistics_cached(context):
+    PredictionEngine.get_prediction_statistics()
+    return lambda: PredictionEngine.get_prediction_statistics()
+
+@benchmark('engine.get_prediction_statistics_by_department')
+def prediction_statistics_by_department(context):
+    def run():
+        invalidate_prediction_statistics()
+        PredictionEngine.get_prediction_statistics(group_by=['student__department'])
+    return run
+
+@benchmark('services.process_results_csv', writes=True)
+def process_results_csv(context):
+    """Upload of up to CSV_MAX_ROWS results for existing students, re-imported on every run"""
+    student_ids = list(Student.objects.order_by('pk').values_list('student_id', flat=True)[:CSV_MAX_ROWS // 5])
+    courses = list(Course.objects.order_by('pk').values_list('course_code', 'credit_units')[:5])
+    if not student_ids or not courses:
+        return None
+    
+    rows = [
+        {'student_id': student_id, 'course_code': code, 'score': (i * 7 + j * 13) % 100, 'credit_units': units}
+        for i, student_id in enumerate(student_ids)
+        for j, (code, units) in enumerate(courses)
+    ]
+    data = pd.DataFrame(rows).to_csv(index=False).encode()
+    
+    def run():
+        outcome = CSVImportService.process_results_csv(io.BytesIO(data), 'Benchmark')
+        if not outcome['success']:
+            raise RuntimeError(outcome['error'])
+    return run
+
+@benchmark('reports.generate_report')
+def generate_report(context):
+    """Cold render of one report into a scratch directory"""
+    prediction = Prediction.objects.current().filter(risk_level='at_risk').select_related(
+        'student'
+    ).prefetch_related('interventions').first()
+    if prediction is None:
+        return None
+    
+    directory = tempfile.TemporaryDirectory()
+    reports_dir = PredictionReportGenerator.REPORTS_DIR
+    PredictionReportGenerator.REPORTS_DIR = directory.name
+    
+    def run():
+        os.remove(PredictionReportGenerator.generate_report(prediction))
+    
+    def teardown():
+        PredictionReportGenerator.REPORTS_DIR = reports_dir
+        directory.cleanup()
+    
+    run.teardown = teardown
+    return run
+
+@benchmark('api.dashboard_stats')
+def dashboard_stats(context):
+    """Cache miss: the payload is rebuilt on every run"""
+    def run():
+        cache.delete(DASHBOARD_STATS_KEY)
+        get(context['client'], '/api/dashboard/')
+    return run
+
+@benchmark('api.dashboard_stats_cached')
+def dashboard_stats_cached(context):
+    get(context['client'], '/api/dashboard/')
+    return lambda: get(context['client'], '/api/dashboard/')
+
+@benchmark('api.students_list')
+def students_list(context):
+    return lambda: get(context['client'], '/api/students/students/')
+
+@benchmark('api.predictions_list')
+def predictions_list(context):
+    return lambda: get(context['client'], '/api/predictions/predictions/')
+
+@benchmark('api.predictions_at_risk')
+def predictions_at_risk(context):
+    return lambda: get(context['client'], '/api/predictions/predictions/at_risk/')
+
+def get(client, path):
+    response = client.get(path)
+    if response.status_code != 200:
+        raise RuntimeError(f"GET {path} returned {response.status_code}")
+    return response
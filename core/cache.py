@@ -0,0 +1,119 @@
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .metrics import registry
+
+DASHBOARD_STATS_KEY = 'core:dashboard_stats'
+
+# Signals keep the payload fresh; the timeout only bounds staleness from raw SQL or shell edits
+DASHBOARD_STATS_TIMEOUT = getattr(settings, 'DASHBOARD_STATS_CACHE_TIMEOUT', 300)
+
+PREDICTION_STATISTICS_TIMEOUT = getattr(settings, 'PREDICTION_STATISTICS_CACHE_TIMEOUT', 300)
+
+# Per-student entries are invalidated by version bumps; the timeout lets orphans expire
+STUDENT_CACHE_TIMEOUT = getattr(settings, 'STUDENT_CACHE_TIMEOUT', 24 * 60 * 60)
+
+# Version names shared by many keys; every student also has a 'student:<pk>' version
+ALL_STUDENTS = 'students'
+COURSES = 'courses'
+PREDICTIONS = 'predictions'
+
+_MISSING = object()
+
+def cached(namespace, key, build, timeout):
+    """cache.get_or_set that counts hits and misses under `namespace`"""
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        registry.record_cache(namespace, hits=1)
+        return value
+    
+    registry.record_cache(namespace, misses=1)
+    value = build()
+    cache.set(key, value, timeout)
+    return value
+
+def get_versions(names):
+    """
+    Current token of each version name. A missing (never set or evicted) token
+    is replaced by a fresh one, so keys built from the old token stay unreachable.
+    """
+    keys = {f'core:version:{name}': name for name in names}
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, uuid.uuid4().hex, None)
+        found.update(cache.get_many(missing))
+    return {name: found.get(key) or uuid.uuid4().hex for key, name in keys.items()}
+
+def bump_versions(names):
+    """Orphan every key built from these versions once the current transaction commits"""
+    tokens = {f'core:version:{name}': uuid.uuid4().hex for name in names}
+    if tokens:
+        transaction.on_commit(lambda: cache.set_many(tokens, None))
+
+def student_cache_key(namespace, student_pk, versions, parts):
+    return ':'.join([
+        'core', namespace, str(student_pk), versions[ALL_STUDENTS], versions[f'student:{student_pk}'],
+        *(versions[name] for name in sorted(versions) if not name.startswith('student')),
+        *map(str, parts)
+    ])
+
+def cached_for_student(namespace, student_pk, build, parts=(), depends_on=()):
+    """
+    Cache build() under a key versioned by the student, so invalidate_students
+    drops it; `depends_on` adds shared versions such as COURSES
+    """
+    versions = get_versions([ALL_STUDENTS, f'student:{student_pk}', *depends_on])
+    key = student_cache_key(namespace, student_pk, versions, parts)
+    return cached(namespace, key, build, STUDENT_CACHE_TIMEOUT)
+
+def cached_for_students(namespace, student_pks, build, parts=(), depends_on=()):
+    """
+    Batched cached_for_student: one round trip for the versions, one for the
+    values and one to store the misses. build(missing_pks) makes the missing
+    values, in the same order; values are returned in the order of `student_pks`.
+    """
+    student_pks = list(student_pks)
+    versions = get_versions([ALL_STUDENTS, *depends_on, *(f'student:{pk}' for pk in student_pks)])
+    shared = {name: token for name, token in versions.items() if not name.startswith('student:')}
+    keys = [
+        student_cache_key(namespace, pk, {**shared, f'student:{pk}': versions[f'student:{pk}']}, parts)
+        for pk in student_pks
+    ]
+    
+    found = cache.get_many(keys)
+    missing = [(pk, key) for pk, key in zip(student_pks, keys) if key not in found]
+    built = {}
+    if missing:
+        built = dict(zip([key for _, key in missing], build([pk for pk, _ in missing])))
+    if built:
+        cache.set_many(built, STUDENT_CACHE_TIMEOUT)
+    registry.record_cache(namespace, hits=len(keys) - len(built), misses=len(built))
+    
+    return [found[key] if key in found else built[key] for key in keys]
+
+def invalidate_students(student_pks):
+    """Drop everything cached for these students; None drops it for every student"""
+    if student_pks is None:
+        bump_versions([ALL_STUDENTS])
+    else:
+        bump_versions([f'student:{pk}' for pk in student_pks])
+
+def get_prediction_statistics(group_by, build):
+    """Cached statistics over the current predictions, one entry per grouping"""
+    versions = get_versions([PREDICTIONS])
+    key = f"core:prediction_statistics:{versions[PREDICTIONS]}:{','.join(group_by or [])}"
+    return cached('prediction_statistics', key, build, PREDICTION_STATISTICS_TIMEOUT)
+
+def invalidate_prediction_statistics():
+    bump_versions([PREDICTIONS])
+
+def get_dashboard_stats(build):
+    """Return the cached dashboard payload, building and caching it with `build` on a miss"""
+    return cached('dashboard_stats', DASHBOARD_STATS_KEY, build, DASHBOARD_STATS_TIMEOUT)
+
+def invalidate_dashboard_stats():
+    """Drop the cached dashboard payload once the current transaction commits"""
+    transaction.on_commit(lambda: cache.delete(DASHBOARD_STATS_KEY))
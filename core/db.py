@@ -0,0 +1,28 @@
+import re
+from django.conf import settings
+
+# Plan lines that mean a whole table is read row by row, or a result is sorted after reading
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?!.*\bUSING\b)(?!CONSTANT)'),
+    'postgresql': re.compile(r'\bSeq Scan\b'),
+}
+SORT_PATTERNS = {
+    'sqlite': re.compile(r'\bUSE TEMP B-TREE FOR (RIGHT PART OF )?ORDER BY\b'),
+    'postgresql': re.compile(r'\bSort\b'),
+}
+
+def plan_problems(plan, vendor):
+    """Full scans and sorts in a query plan, as the plan lines that show them"""
+    patterns = [FULL_SCAN_PATTERNS.get(vendor), SORT_PATTERNS.get(vendor)]
+    return [
+        line.strip() for line in plan.splitlines()
+        if any(pattern and pattern.search(line) for pattern in patterns)
+    ]
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """connection_created receiver: tune each new SQLite connection with settings.SQLITE_PRAGMAS"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
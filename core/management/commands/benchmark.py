@@ -0,0 +1,126 @@
+import io
+import json
+import platform
+import django
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from core.benchmarks import BENCHMARKS, compare, run_benchmarks
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the engine, CSV import, report and API hot paths against synthetic '
+        'datasets of several sizes, write the results as JSON and compare them with a baseline'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales', default='200,2000',
+            help='Comma-separated student counts; each gets a fresh test database'
+        )
+        parser.add_argument(
+            '--existing', action='store_true',
+            help=(
+                'Benchmark the configured database as it is instead of synthetic datasets; '
+                'only the read-only benchmarks run'
+            )
+        )
+        parser.add_argument('--repeats', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--only', default='', help=f"Comma-separated subset of: {', '.join(BENCHMARKS)}")
+        parser.add_argument('--output', help='Write results to this JSON file')
+        parser.add_argument('--baseline', help='Compare against results saved by an earlier --output')
+        parser.add_argument(
+            '--threshold', type=float, default=0.25,
+            help='Allowed fractional growth in time and memory before flagging a regression'
+        )
+        parser.add_argument('--strict', action='store_true', help='Exit with an error on any regression')
+    
+    def handle(self, *args, **options):
+        only = [name for name in options['only'].split(',') if name]
+        unknown = set(only) - set(BENCHMARKS)
+        if unknown:
+            raise CommandError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+        
+        setup_test_environment()
+        try:
+            if options['existing']:
+                results = {'existing': self.run_scale(None, options, only)}
+            else:
+                results = {
+                    str(scale): self.run_scale(scale, options, only)
+                    for scale in (int(value) for value in options['scales'].split(','))
+                }
+        finally:
+            teardown_test_environment()
+        
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'repeats': options['repeats'],
+                'seed': options['seed'],
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+        
+        if options['baseline']:
+            self.check_baseline(results, options)
+    
+    def run_scale(self, scale, options, only):
+        """Benchmark one dataset: a fresh synthetic test database, or the current one"""
+        if scale is None:
+            return self.print_results(
+                'existing database', run_benchmarks(options['repeats'], only, read_only=True)
+            )
+        
+        cache.clear()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(f"Generating {scale} synthetic students...")
+            call_command(
+                'generate_synthetic', students=scale, courses=max(20, scale // 50),
+                seed=options['seed'], stdout=io.StringIO()
+            )
+            return self.print_results(f"{scale} students", run_benchmarks(options['repeats'], only))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+    
+    def print_results(self, label, results):
+        self.stdout.write(self.style.MIGRATE_HEADING(label))
+        for name, metrics in results.items():
+            if 'skipped' in metrics:
+                self.stdout.write(f"  {name:<48} skipped: {metrics['skipped']}")
+                continue
+            self.stdout.write(
+                f"  {name:<48} {metrics['median_seconds'] * 1000:>10.1f} ms"
+                f" {metrics['queries']:>6} queries {metrics['peak_memory_bytes'] / 1024:>10.0f} KiB"
+            )
+        return results
+    
+    def check_baseline(self, results, options):
+        with open(options['baseline']) as f:
+            baseline = json.load(f)['results']
+        
+        regressions = compare(results, baseline, options['threshold'])
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+            return
+        
+        for regression in regressions:
+            self.stdout.write(self.style.WARNING(
+                f"{regression['scale']} / {regression['benchmark']}: {regression['metric']} "
+                f"{regression['baseline']} -> {regression['current']}"
+            ))
+        if options['strict']:
+            raise CommandError(f"{len(regressions)} regressions against {options['baseline']}")
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from core.db import FULL_SCAN_PATTERNS
+from students.models import Student, Result, StudentSemesterSummary
+from predictions.models import Prediction, Intervention
+
+class Command(BaseCommand):
+    help = (
+        'Print query plans for the hot API queries and flag full table scans. '
+        'Run against a database seeded at realistic size; small tables are often scanned by design.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--strict', action='store_true',
+            help='Exit with an error if any query plan contains a full table scan'
+        )
+    
+    def hot_queries(self):
+        student = Student.objects.order_by().first()
+        prediction = Prediction.objects.order_by().first()
+        student_pk = student.pk if student else 0
+        student_id = student.student_id if student else ''
+        department = student.department if student else ''
+        prediction_pk = prediction.pk if prediction else 0
+        
+        return [
+            ('PredictionViewSet.at_risk',
+             Prediction.objects.current().filter(risk_level='at_risk').order_by('-predicted_at', '-id')[:50]),
+            ('PredictionViewSet.list ?risk_level=',
+             Prediction.objects.filter(risk_level='at_risk').order_by('-predicted_at', '-id')[:50]),
+            ('PredictionViewSet.list ?student_id=',
+             Prediction.objects.filter(student__student_id=student_id).order_by('-predicted_at', '-id')[:50]),
+            ('PredictionViewSet.list',
+             Prediction.objects.order_by('-predicted_at', '-id')[:50]),
+            ('ResultViewSet.list ?student_id=',
+             Result.objects.filter(student__student_id=student_id).order_by('id')[:50]),
+            ('Student.calculate_gpa summary lookup',
+             StudentSemesterSummary.objects.filter(student_id=student_pk, semester='First')),
+            ('Students by department',
+             Student.objects.filter(department=department).order_by('student_id')[:50]),
+            ('Interventions for a prediction',
+             Intervention.objects.filter(prediction_id=prediction_pk)),
+        ]
+    
+    def handle(self, *args, **options):
+        pattern = FULL_SCAN_PATTERNS.get(connection.vendor)
+        full_scans = []
+        
+        for name, queryset in self.hot_queries():
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(plan)
+            self.stdout.write('')
+            if pattern and pattern.search(plan):
+                full_scans.append(name)
+        
+        if not full_scans:
+            self.stdout.write(self.style.SUCCESS('All hot queries use indexes'))
+            return
+        
+        message = f"Full table scans in: {', '.join(full_scans)}"
+        if options['strict']:
+            raise CommandError(message)
+        self.stdout.write(self.style.WARNING(message))
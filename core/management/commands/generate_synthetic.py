@@ -0,0 +1,304 @@
+import time
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from students.models import Student, Course, Result, AdditionalFactors, StudentSemesterSummary
+from students.services import CSVImportService
+from predictions.engine import PredictionEngine
+
+SEMESTER_NAMES = [
+    'First', 'Second', 'Third', 'Fourth', 'Fifth', 'Sixth',
+    'Seventh', 'Eighth', 'Ninth', 'Tenth', 'Eleventh', 'Twelfth',
+]
+
+DEPARTMENTS = [
+    ('CSC', 'Computer Science'),
+    ('MTH', 'Mathematics'),
+    ('PHY', 'Physics'),
+    ('CHM', 'Chemistry'),
+    ('ECO', 'Economics'),
+    ('ENG', 'Engineering'),
+    ('BIO', 'Biology'),
+    ('ACC', 'Accounting'),
+]
+
+FIRST_NAMES = [
+    'John', 'Jane', 'Mike', 'Ada', 'Chidi', 'Amaka', 'Tunde', 'Zainab', 'Emeka', 'Ngozi',
+    'David', 'Grace', 'Samuel', 'Fatima', 'Ibrahim', 'Blessing', 'Daniel', 'Esther', 'Yusuf', 'Kemi',
+]
+
+LAST_NAMES = [
+    'Doe', 'Smith', 'Johnson', 'Okafor', 'Adeyemi', 'Bello', 'Eze', 'Okonkwo', 'Musa', 'Balogun',
+    'Williams', 'Nwosu', 'Abubakar', 'Olawale', 'Ibe', 'Danjuma', 'Uche', 'Lawal', 'Afolabi', 'Obi',
+]
+
+class Command(BaseCommand):
+    help = (
+        'Bulk-generate a deterministic synthetic dataset of students, courses, results, '
+        'additional factors and predictions for load testing'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=1000)
+        parser.add_argument('--courses', type=int, default=60)
+        parser.add_argument('--semesters', type=int, default=2, help=f'At most {len(SEMESTER_NAMES)}')
+        parser.add_argument('--courses-per-semester', type=int, default=6)
+        parser.add_argument('--departments', type=int, default=4, help=f'At most {len(DEPARTMENTS)}')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='SYN', help='Prefix for student IDs and course codes')
+        parser.add_argument('--admission-years', default='2019-2024', help='Inclusive range, e.g. 2019-2024')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        
+        distributions = parser.add_argument_group('distributions')
+        distributions.add_argument('--score-mean', type=float, default=58)
+        distributions.add_argument('--score-std', type=float, default=14)
+        distributions.add_argument(
+            '--ability-weight', type=float, default=0.7,
+            help='How strongly one student\'s scores and factors follow a shared ability (0-1)'
+        )
+        distributions.add_argument('--attendance-mean', type=float, default=80)
+        distributions.add_argument('--attendance-std', type=float, default=12)
+        distributions.add_argument('--assignment-mean', type=float, default=65)
+        distributions.add_argument('--assignment-std', type=float, default=15)
+        distributions.add_argument('--study-hours-mean', type=float, default=14)
+        distributions.add_argument('--study-hours-std', type=float, default=6)
+        distributions.add_argument('--admission-mean', type=float, default=250)
+        distributions.add_argument('--admission-std', type=float, default=45)
+        distributions.add_argument(
+            '--socioeconomic-weights', default='0.3,0.5,0.2',
+            help='Share of low, medium and high socioeconomic status'
+        )
+        distributions.add_argument(
+            '--missing-factors', type=float, default=0.02,
+            help='Share of students with no additional factors'
+        )
+        
+        parser.add_argument(
+            '--predict-semester', default='Current',
+            help='Semester label for the generated predictions'
+        )
+        parser.add_argument('--no-predictions', action='store_true')
+    
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = np.random.default_rng(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+        
+        if not 1 <= options['semesters'] <= len(SEMESTER_NAMES):
+            raise CommandError(f"--semesters must be between 1 and {len(SEMESTER_NAMES)}")
+        if not 1 <= options['departments'] <= len(DEPARTMENTS):
+            raise CommandError(f"--departments must be between 1 and {len(DEPARTMENTS)}")
+        if options['courses'] < options['departments']:
+            raise CommandError("--courses must be at least --departments")
+        if Student.objects.filter(student_id__startswith=prefix).exists():
+            raise CommandError(
+                f"Students with prefix {prefix} already exist; use another --prefix or a fresh database"
+            )
+        
+        started = time.perf_counter()
+        with self.phase('students'):
+            students = self.create_students()
+        with self.phase('courses'):
+            courses = self.create_courses()
+        with self.phase('additional factors'):
+            self.create_factors(students)
+        with self.phase('results'):
+            results = self.create_results(students, courses)
+        with self.phase('GPA summaries and feature vectors'):
+            for start in range(0, len(students['pk']), self.batch_size):
+                StudentSemesterSummary.rebuild(
+                    students['pk'][start:start + self.batch_size].tolist(), batch_size=self.batch_size
+                )
+        if not options['no_predictions']:
+            with self.phase('predictions'):
+                outcome = PredictionEngine.predict_cohort(
+                    Student.objects.filter(student_id__startswith=prefix), options['predict_semester']
+                )
+            self.stdout.write(f"  {len(outcome['predictions'])} predictions, {len(outcome['errors'])} skipped")
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {len(students['pk'])} students, {len(courses['pk'])} courses and "
+            f"{results} results in {time.perf_counter() - started:.1f}s"
+        ))
+    
+    @contextmanager
+    def phase(self, name):
+        self.stdout.write(f"Generating {name}...")
+        started = time.perf_counter()
+        yield
+        self.stdout.write(f"  done in {time.perf_counter() - started:.1f}s")
+    
+    def normal(self, mean, std, ability, low, high):
+        """Values around `mean` that follow each student's ability by --ability-weight"""
+        weight = self.options['ability_weight']
+        noise = self.rng.standard_normal(len(ability))
+        values = mean + std * (weight * ability + np.sqrt(1 - weight ** 2) * noise)
+        return np.clip(values, low, high)
+    
+    def create_students(self):
+        """Returns arrays of student pks, department indexes and latent abilities"""
+        count = self.options['students']
+        prefix = self.options['prefix']
+        first_year, last_year = (int(year) for year in self.options['admission_years'].split('-'))
+        
+        ability = self.rng.standard_normal(count)
+        departments = self.rng.integers(0, self.options['departments'], count)
+        admission_years = self.rng.integers(first_year, last_year + 1, count)
+        admission_scores = self.normal(
+            self.options['admission_mean'], self.options['admission_std'], ability, 100, 400
+        ).round()
+        first_names = self.rng.integers(0, len(FIRST_NAMES), count)
+        last_names = self.rng.integers(0, len(LAST_NAMES), count)
+        width = len(str(count))
+        
+        for start in range(0, count, self.batch_size):
+            with transaction.atomic():
+                Student.objects.bulk_create([
+                    Student(
+                        student_id=f'{prefix}{i:0{width}d}',
+                        first_name=FIRST_NAMES[first_names[i]],
+                        last_name=LAST_NAMES[last_names[i]],
+                        email=f'{prefix.lower()}{i:0{width}d}@synthetic.spps.edu',
+                        department=DEPARTMENTS[departments[i]][1],
+                        admission_year=int(admission_years[i]),
+                        admission_score=float(admission_scores[i])
+                    )
+                    for i in range(start, min(start + self.batch_size, count))
+                ])
+        
+        pks = Student.objects.filter(student_id__startswith=prefix).order_by('student_id').values_list(
+            'pk', flat=True
+        )
+        return {'pk': np.array(pks), 'department': departments, 'ability': ability}
+    
+    def create_courses(self):
+        """Courses are dealt round-robin across departments; returns pk, department and credit arrays"""
+        count = self.options['courses']
+        prefix = self.options['prefix']
+        departments = np.arange(count) % self.options['departments']
+        credit_units = self.rng.choice([2, 3, 4], count, p=[0.2, 0.6, 0.2])
+        
+        codes = [f'{prefix}{DEPARTMENTS[d][0]}{i:04d}' for i, d in enumerate(departments)]
+        Course.objects.bulk_create([
+            Course(
+                course_code=code,
+                course_title=f'{DEPARTMENTS[d][1]} {i + 1}',
+                credit_units=int(credit_units[i]),
+                department=DEPARTMENTS[d][1]
+            )
+            for i, (code, d) in enumerate(zip(codes, departments))
+        ], batch_size=self.batch_size)
+        
+        pks = Course.objects.in_bulk(codes, field_name='course_code')
+        return {
+            'pk': np.array([pks[code].pk for code in codes]),
+            'department': departments,
+            'credit_units': credit_units
+        }
+    
+    def create_factors(self, students):
+        ability = students['ability']
+        count = len(ability)
+        attendance = self.normal(self.options['attendance_mean'], self.options['attendance_std'], ability, 0, 100)
+        assignments = self.normal(self.options['assignment_mean'], self.options['assignment_std'], ability, 0, 100)
+        study_hours = self.normal(self.options['study_hours_mean'], self.options['study_hours_std'], ability, 0, 40)
+        weights = np.array([float(weight) for weight in self.options['socioeconomic_weights'].split(',')])
+        socioeconomic = self.rng.choice(['low', 'medium', 'high'], count, p=weights / weights.sum())
+        extracurricular = self.rng.random(count) < 0.4
+        has_factors = self.rng.random(count) >= self.options['missing_factors']
+        
+        selected = np.flatnonzero(has_factors)
+        for start in range(0, len(selected), self.batch_size):
+            with transaction.atomic():
+                AdditionalFactors.objects.bulk_create([
+                    AdditionalFactors(
+                        student_id=int(students['pk'][i]),
+                        attendance_percentage=round(float(attendance[i]), 1),
+                        assignment_average=round(float(assignments[i]), 1),
+                        study_hours_per_week=round(float(study_hours[i]), 1),
+                        socioeconomic_status=socioeconomic[i],
+                        extracurricular_participation=bool(extracurricular[i])
+                    )
+                    for i in selected[start:start + self.batch_size]
+                ])
+    
+    def insert_rows(self, model, fields, rows):
+        """
+        executemany() INSERT of plain tuples. At tens of millions of rows,
+        building model instances for bulk_create costs far more than the
+        database does. Bypasses save() and signals like bulk_create.
+        """
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(model._meta.get_field(field).column) for field in fields)
+        placeholders = ', '.join(['%s'] * len(fields))
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders})",
+                list(rows)
+            )
+    
+    def create_results(self, students, courses):
+        """
+        Every student takes --courses-per-semester distinct courses from their
+        department each semester. Semesters are written in order so the GPA
+        summaries see them in order. Returns the number of results written.
+        """
+        per_semester = self.options['courses_per_semester']
+        written = 0
+        
+        pools = [
+            np.flatnonzero(courses['department'] == department)
+            for department in range(self.options['departments'])
+        ]
+        
+        for semester in SEMESTER_NAMES[:self.options['semesters']]:
+            for start in range(0, len(students['pk']), self.batch_size):
+                block = slice(start, start + self.batch_size)
+                student_pks = students['pk'][block]
+                departments = students['department'][block]
+                ability = students['ability'][block]
+                
+                rows_student, rows_course = [], []
+                for department, pool in enumerate(pools):
+                    members = np.flatnonzero(departments == department)
+                    taken = min(per_semester, len(pool))
+                    if not len(members):
+                        continue
+                    # A random permutation of the pool per student, cut to `taken` courses
+                    picks = np.argsort(self.rng.random((len(members), len(pool))), axis=1)[:, :taken]
+                    rows_student.append(np.repeat(members, taken))
+                    rows_course.append(pool[picks].ravel())
+                
+                rows_student = np.concatenate(rows_student)
+                rows_course = np.concatenate(rows_course)
+                scores = self.normal(
+                    self.options['score_mean'], self.options['score_std'], ability[rows_student], 0, 100
+                ).round()
+                grades = CSVImportService.calculate_grades(pd.Series(scores))
+                credit_units = courses['credit_units'][rows_course]
+                quality_points = grades.map(Result.GRADE_POINTS).to_numpy() * credit_units
+                
+                created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+                with transaction.atomic():
+                    self.insert_rows(Result, [
+                        'student', 'course', 'semester', 'score', 'grade',
+                        'credit_units', 'quality_points', 'created_at'
+                    ], zip(
+                        student_pks[rows_student].tolist(),
+                        courses['pk'][rows_course].tolist(),
+                        [semester] * len(rows_student),
+                        scores.tolist(),
+                        grades.tolist(),
+                        credit_units.tolist(),
+                        quality_points.astype(float).tolist(),
+                        [created_at] * len(rows_student)
+                    ))
+                written += len(rows_student)
+            
+            self.stdout.write(f"  {semester} semester: {written} results so far")
+        
+        return written
@@ -0,0 +1,118 @@
+import bisect
+import threading
+from collections import defaultdict
+
+# Histogram bucket upper bounds; everything above the last lands in +Inf
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+QUERY_COUNT_BUCKETS = [0, 1, 2, 5, 10, 20, 50, 100, 200, 500]
+
+class Histogram:
+    """Cumulative-on-render histogram in the Prometheus style"""
+    
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+    
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ['+Inf'], self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum:.6f}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+class MetricsRegistry:
+    """
+    Per-view request statistics and cache hit/miss counts for this process.
+    Each gunicorn worker keeps its own registry, so a scrape reports the
+    worker that served it.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self._lock:
+            self.requests = defaultdict(int)
+            self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+            self.query_counts = defaultdict(lambda: Histogram(QUERY_COUNT_BUCKETS))
+            self.db_seconds = defaultdict(float)
+            self.slow_queries = defaultdict(int)
+            self.cache_lookups = defaultdict(int)
+    
+    def record_request(self, view, method, status, duration, queries, db_seconds, slow_queries=0):
+        with self._lock:
+            self.requests[(view, method, status)] += 1
+            self.latency[view].observe(duration)
+            self.query_counts[view].observe(queries)
+            self.db_seconds[view] += db_seconds
+            if slow_queries:
+                self.slow_queries[view] += slow_queries
+    
+    def record_cache(self, namespace, hits=0, misses=0):
+        with self._lock:
+            if hits:
+                self.cache_lookups[(namespace, 'hit')] += hits
+            if misses:
+                self.cache_lookups[(namespace, 'miss')] += misses
+    
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            lines = [
+                '# HELP spps_http_requests_total Requests served, by view, method and status code',
+                '# TYPE spps_http_requests_total counter',
+            ]
+            for (view, method, status), count in sorted(self.requests.items()):
+                lines.append(
+                    f'spps_http_requests_total{{view="{view}",method="{method}",status="{status}"}} {count}'
+                )
+            
+            lines += [
+                '# HELP spps_http_request_duration_seconds Request latency by view',
+                '# TYPE spps_http_request_duration_seconds histogram',
+            ]
+            for view, histogram in sorted(self.latency.items()):
+                lines += histogram.render('spps_http_request_duration_seconds', f'view="{view}"')
+            
+            lines += [
+                '# HELP spps_db_queries_per_request SQL queries run by one request',
+                '# TYPE spps_db_queries_per_request histogram',
+            ]
+            for view, histogram in sorted(self.query_counts.items()):
+                lines += histogram.render('spps_db_queries_per_request', f'view="{view}"')
+            
+            lines += [
+                '# HELP spps_db_query_seconds_total Time spent in SQL queries by view',
+                '# TYPE spps_db_query_seconds_total counter',
+            ]
+            for view, seconds in sorted(self.db_seconds.items()):
+                lines.append(f'spps_db_query_seconds_total{{view="{view}"}} {seconds:.6f}')
+            
+            lines += [
+                '# HELP spps_db_slow_queries_total Queries over METRICS_SLOW_QUERY_MS by view',
+                '# TYPE spps_db_slow_queries_total counter',
+            ]
+            for view, count in sorted(self.slow_queries.items()):
+                lines.append(f'spps_db_slow_queries_total{{view="{view}"}} {count}')
+            
+            lines += [
+                '# HELP spps_cache_lookups_total Cache lookups by namespace and result (core.cache)',
+                '# TYPE spps_cache_lookups_total counter',
+            ]
+            for (namespace, result), count in sorted(self.cache_lookups.items()):
+                lines.append(f'spps_cache_lookups_total{{namespace="{namespace}",result="{result}"}} {count}')
+        
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
@@ -0,0 +1,152 @@
+import logging
+import time
+import traceback
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+from .metrics import registry
+from .profiling import request_profiling
+from .routers import read_from_replica, replica_configured
+
+slow_query_logger = logging.getLogger('spps.slow_queries')
+
+# Frames from these paths are skipped when looking for a slow query's call site
+LIBRARY_PATHS = ('/django/', '/rest_framework/', '/site-packages/', 'core/middleware.py')
+
+def view_label(view_func, request):
+    """'StudentViewSet.list' for viewset actions, the function name for plain views"""
+    view_class = getattr(view_func, 'cls', None)
+    actions = getattr(view_func, 'actions', None)
+    if view_class is not None and actions:
+        action = actions.get(request.method.lower(), request.method.lower())
+        return f"{view_class.__name__}.{action}"
+    if view_class is not None and view_class.__name__ != 'WrappedAPIView':
+        return view_class.__name__
+    return getattr(view_func, '__name__', 'unknown')
+
+def call_site():
+    """The innermost project frame on the stack, as 'path:line in function'"""
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        if not any(path in frame.filename for path in LIBRARY_PATHS):
+            return f"{frame.filename}:{frame.lineno} in {frame.name}"
+    return 'unknown'
+
+class QueryRecorder:
+    """execute_wrapper that counts and times every query of a request"""
+    
+    def __init__(self, slow_threshold):
+        self.count = 0
+        self.seconds = 0.0
+        self.slow = 0
+        self.slow_threshold = slow_threshold
+        self.view = 'unresolved'
+    
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            if self.slow_threshold is not None and elapsed * 1000 >= self.slow_threshold:
+                self.slow += 1
+                slow_query_logger.warning(
+                    "Slow query (%.1f ms) in %s at %s: %s",
+                    elapsed * 1000, self.view, call_site(), sql
+                )
+
+class RequestMetricsMiddleware:
+    """
+    Records latency, query count and database time per resolved view in
+    core.metrics.registry. Set METRICS_SLOW_QUERY_MS to log slower queries
+    with their SQL and call site to the 'spps.slow_queries' logger.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'METRICS_ENABLED', True)
+        self.slow_threshold = getattr(settings, 'METRICS_SLOW_QUERY_MS', None)
+    
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+        
+        recorder = QueryRecorder(self.slow_threshold)
+        request._query_recorder = recorder
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+        
+        registry.record_request(
+            recorder.view, request.method, response.status_code,
+            time.perf_counter() - started, recorder.count, recorder.seconds, recorder.slow
+        )
+        return response
+    
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        recorder = getattr(request, '_query_recorder', None)
+        if recorder is not None:
+            recorder.view = view_label(view_func, request)
+
+class ProfilingMiddleware:
+    """
+    Profiles the engine, CSV import and report code paths for requests that
+    send `X-Profile: 1` (stage timings) or `X-Profile: cprofile` (timings plus
+    a cProfile dump), when PROFILING_ALLOW_HEADER is on. Saved profile ids are
+    returned in the X-Profile-Ids response header; download them from /api/profiles/.
+    Report renders queued by the request are profiled by their worker and only listed there.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.allow_header = getattr(settings, 'PROFILING_ALLOW_HEADER', settings.DEBUG)
+    
+    def __call__(self, request):
+        header = request.headers.get('X-Profile', '').lower()
+        if not self.allow_header or header in ('', '0', 'false'):
+            return self.get_response(request)
+        
+        with request_profiling('cprofile' if header == 'cprofile' else 'timings') as saved:
+            response = self.get_response(request)
+        if saved:
+            response['X-Profile-Ids'] = ','.join(saved)
+        return response
+
+class ReplicaRoutingMiddleware:
+    """
+    Serves GET/HEAD/OPTIONS requests from the read replica. After a client
+    makes a write request it is pinned to the primary for
+    DATABASE_REPLICA_STICKY_SECONDS, so it reads its own writes while the
+    replica catches up. The pin is a signed cookie, so it holds whichever
+    worker serves the next request and never spills over to other clients.
+    """
+    
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+    PIN_COOKIE = 'spps_primary_pin'
+    PIN_SALT = 'core.middleware.ReplicaRoutingMiddleware'
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sticky_seconds = getattr(settings, 'DATABASE_REPLICA_STICKY_SECONDS', 5)
+    
+    def __call__(self, request):
+        if not replica_configured():
+            return self.get_response(request)
+        
+        if request.method not in self.SAFE_METHODS:
+            response = self.get_response(request)
+            response.set_signed_cookie(
+                self.PIN_COOKIE, '1', salt=self.PIN_SALT, max_age=self.sticky_seconds,
+                secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax'
+            )
+            return response
+        
+        # The signature carries a timestamp, so an expired pin is rejected even if the client resends it
+        pinned = request.get_signed_cookie(
+            self.PIN_COOKIE, default=None, salt=self.PIN_SALT, max_age=self.sticky_seconds
+        )
+        with read_from_replica(pinned is None):
+            return self.get_response(request)
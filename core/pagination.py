@@ -0,0 +1,16 @@
+from rest_framework.pagination import CursorPagination
+
+class IdCursorPagination(CursorPagination):
+    """
+    Default pagination for list endpoints. Cursors seek on an indexed,
+    unique ordering so every page costs the same however deep it is.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+class StudentCursorPagination(IdCursorPagination):
+    ordering = 'student_id'
+
+class PredictionCursorPagination(IdCursorPagination):
+    ordering = ('-predicted_at', '-id')
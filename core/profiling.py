@@ -0,0 +1,154 @@
+import cProfile
+import functools
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from django.conf import settings
+from django.utils import timezone
+
+# Profiling state of the current thread: the open session and, inside a
+# request that sent the profiling header, what it asked for
+_state = threading.local()
+
+PROFILE_ID_PATTERN = re.compile(r'^[\w.-]+$')
+
+def profiles_dir():
+    return getattr(settings, 'PROFILING_DIR', os.path.join(settings.MEDIA_ROOT, 'profiles'))
+
+def requested_mode():
+    """None when profiling is off, otherwise 'timings' or 'cprofile'"""
+    header_mode = getattr(_state, 'header_mode', None)
+    if header_mode:
+        return header_mode
+    if getattr(settings, 'PROFILING_ENABLED', False):
+        return 'cprofile' if getattr(settings, 'PROFILING_CPROFILE', False) else 'timings'
+    return None
+
+class ProfileSession:
+    """Stage timings, and optionally a cProfile run, for one profiled call"""
+    
+    def __init__(self, name, use_cprofile):
+        self.name = name
+        self.id = f"{timezone.now():%Y%m%d_%H%M%S}_{name}_{uuid.uuid4().hex[:8]}"
+        self.started_at = timezone.now()
+        self.stages = defaultdict(float)
+        self.total_seconds = 0.0
+        self.profiler = cProfile.Profile() if use_cprofile else None
+    
+    def save(self):
+        """Write <id>.json, plus <id>.prof when cProfile ran; old profiles are pruned"""
+        directory = profiles_dir()
+        os.makedirs(directory, exist_ok=True)
+        
+        if self.profiler:
+            self.profiler.dump_stats(os.path.join(directory, f"{self.id}.prof"))
+        with open(os.path.join(directory, f"{self.id}.json"), 'w') as f:
+            json.dump(self.as_dict(), f, indent=2)
+        
+        prune_profiles(getattr(settings, 'PROFILING_MAX_PROFILES', 200))
+    
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'started_at': self.started_at.isoformat(),
+            'total_seconds': round(self.total_seconds, 6),
+            'stages': {stage: round(seconds, 6) for stage, seconds in self.stages.items()},
+            'unstaged_seconds': round(self.total_seconds - sum(self.stages.values()), 6),
+            'cprofile': f"{self.id}.prof" if self.profiler else None,
+        }
+
+def profiled(name):
+    """
+    Profile calls of the decorated function when profiling is enabled by the
+    PROFILING_ENABLED setting or the X-Profile request header. Called inside
+    another profiled function, it is timed as a stage of that one instead.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(_state, 'session', None) is not None:
+                with stage(name):
+                    return func(*args, **kwargs)
+            
+            mode = requested_mode()
+            if mode is None:
+                return func(*args, **kwargs)
+            
+            session = ProfileSession(name, use_cprofile=mode == 'cprofile')
+            _state.session = session
+            started = time.perf_counter()
+            if session.profiler:
+                session.profiler.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if session.profiler:
+                    session.profiler.disable()
+                session.total_seconds = time.perf_counter() - started
+                _state.session = None
+                session.save()
+                saved = getattr(_state, 'saved', None)
+                if saved is not None:
+                    saved.append(session.id)
+        return wrapper
+    return decorator
+
+@contextmanager
+def stage(name):
+    """Add the time spent in the block to the current profile session, if any"""
+    session = getattr(_state, 'session', None)
+    if session is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        session.stages[name] += time.perf_counter() - started
+
+@contextmanager
+def request_profiling(mode):
+    """
+    Profile every profiled call made while handling one request, or one job it
+    queued (pass the requested_mode() captured when queueing); yields the saved profile ids
+    """
+    _state.header_mode = mode
+    _state.saved = []
+    try:
+        yield _state.saved
+    finally:
+        _state.header_mode = None
+        _state.saved = None
+
+def list_profiles():
+    """Saved profile summaries, newest first"""
+    directory = profiles_dir()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for filename in sorted(os.listdir(directory), reverse=True):
+        if filename.endswith('.json'):
+            with open(os.path.join(directory, filename)) as f:
+                profiles.append(json.load(f))
+    return profiles
+
+def profile_path(profile_id, kind='json'):
+    """Path of a saved profile file, or None if the id is invalid or missing"""
+    if kind not in ('json', 'prof') or not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = os.path.join(profiles_dir(), f"{profile_id}.{kind}")
+    return path if os.path.exists(path) else None
+
+def prune_profiles(keep):
+    """Delete all but the newest `keep` profiles"""
+    for profile in list_profiles()[keep:]:
+        for kind in ('json', 'prof'):
+            path = profile_path(profile['id'], kind)
+            if path:
+                os.remove(path)
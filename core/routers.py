@@ -0,0 +1,46 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connections
+
+# Alias of the read replica in settings.DATABASES; routing is off when it is not configured
+REPLICA_ALIAS = getattr(settings, 'DATABASE_REPLICA_ALIAS', 'replica')
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+@contextmanager
+def read_from_replica(enabled=True):
+    """Route ORM reads made inside the block to the replica, e.g. for reporting jobs"""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+class ReadReplicaRouter:
+    """
+    Sends reads to the replica only inside read_from_replica(), which
+    ReplicaRoutingMiddleware opens for read-only requests. Everything else,
+    and any read inside a transaction on the primary, stays on 'default'.
+    """
+    
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or not replica_configured():
+            return None
+        if connections['default'].in_atomic_block:
+            return 'default'
+        return REPLICA_ALIAS
+    
+    def db_for_write(self, model, **hints):
+        return 'default'
+    
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+    
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives its schema from the primary
+        return db != REPLICA_ALIAS
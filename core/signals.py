@@ -0,0 +1,36 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from students.models import Student, Course, Result, AdditionalFactors
+from students.signals import semester_summaries_changed
+from predictions.models import Prediction
+from .cache import (
+    COURSES, bump_versions, invalidate_dashboard_stats, invalidate_prediction_statistics,
+    invalidate_students
+)
+
+@receiver([post_save, post_delete], sender=Student)
+@receiver([post_save, post_delete], sender=Prediction)
+def dashboard_data_changed(sender, **kwargs):
+    """Students and predictions feed every dashboard figure and the grouped statistics"""
+    invalidate_dashboard_stats()
+    invalidate_prediction_statistics()
+
+@receiver([post_save, post_delete], sender=Student)
+def student_changed(sender, instance, **kwargs):
+    invalidate_students([instance.pk])
+
+@receiver([post_save, post_delete], sender=Result)
+@receiver([post_save, post_delete], sender=AdditionalFactors)
+def student_data_changed(sender, instance, **kwargs):
+    """Results and factors are part of the cached student payload"""
+    invalidate_students([instance.student_id])
+
+@receiver(semester_summaries_changed)
+def summaries_changed(sender, student_ids, **kwargs):
+    """Covers the GPA of bulk result writes, and every student after a full rebuild"""
+    invalidate_students(student_ids)
+
+@receiver([post_save, post_delete], sender=Course)
+def course_changed(sender, **kwargs):
+    """Course details are nested in every cached student payload"""
+    bump_versions([COURSES])
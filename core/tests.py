@@ -0,0 +1,427 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from students.models import Student, Result, StudentSemesterSummary
+from predictions.engine import PredictionEngine
+from predictions.models import Prediction
+from .benchmarks import WRITING_BENCHMARKS, compare, run_benchmarks
+from .cache import get_versions
+from .db import plan_problems
+from .metrics import registry
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'}}
+
+def redis_cache():
+    """A local server when TEST_REDIS_URL is set, otherwise fakeredis"""
+    if os.environ.get('TEST_REDIS_URL'):
+        return {'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': os.environ['TEST_REDIS_URL']
+        }}
+    return {'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://fakeredis:6379/0',
+        'OPTIONS': {'connection_class': fakeredis.FakeConnection} if fakeredis else {},
+    }}
+
+def seed(students=30, **options):
+    """A small deterministic synthetic dataset"""
+    call_command(
+        'generate_synthetic', students=students, courses=8, departments=2, stdout=io.StringIO(), **options
+    )
+
+class QueryPlanTestCase(TestCase):
+    """Checks the plan of every query an endpoint runs against seeded data"""
+    
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}")
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+    
+    def assertIndexedQueries(self, path):
+        """GET `path` and assert none of its SELECTs scans a whole table or sorts its rows"""
+        client = APIClient()
+        client.force_authenticate(get_user_model()(username='plans', is_staff=True))
+        with CaptureQueriesContext(connection) as captured:
+            response = client.get(path)
+        self.assertEqual(response.status_code, 200)
+        
+        selects = [query['sql'] for query in captured if query['sql'].startswith('SELECT')]
+        self.assertTrue(selects)
+        for sql in selects:
+            plan = self.explain(sql)
+            self.assertEqual(plan_problems(plan, connection.vendor), [], f"{sql}\n{plan}")
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed()
+    
+    def test_writing_benchmarks_are_rolled_back(self):
+        predictions = list(Prediction.objects.order_by('pk').values_list('pk', 'is_latest'))
+        results = list(Result.objects.order_by('pk').values_list('pk', 'score'))
+        summaries = list(StudentSemesterSummary.objects.order_by('pk').values_list('pk', 'gpa'))
+        
+        outcome = run_benchmarks(1, only=sorted(WRITING_BENCHMARKS))
+        
+        self.assertEqual(set(outcome), WRITING_BENCHMARKS)
+        for metrics in outcome.values():
+            self.assertIn('median_seconds', metrics)
+        self.assertEqual(list(Prediction.objects.order_by('pk').values_list('pk', 'is_latest')), predictions)
+        self.assertEqual(list(Result.objects.order_by('pk').values_list('pk', 'score')), results)
+        self.assertEqual(list(StudentSemesterSummary.objects.order_by('pk').values_list('pk', 'gpa')), summaries)
+    
+    def test_read_only_skips_writing_benchmarks(self):
+        outcome = run_benchmarks(1, only=['engine.predict_cohort', 'api.dashboard_stats'], read_only=True)
+        
+        self.assertEqual(outcome['engine.predict_cohort'], {'skipped': 'writes to the database'})
+        self.assertIn('median_seconds', outcome['api.dashboard_stats'])
+    
+    def test_existing_database_is_left_untouched(self):
+        predictions = Prediction.objects.count()
+        
+        # The test runner has already set up the test environment the command sets up
+        with mock.patch('core.management.commands.benchmark.setup_test_environment'), \
+                mock.patch('core.management.commands.benchmark.teardown_test_environment'):
+            call_command('benchmark', existing=True, repeats=1, stdout=io.StringIO())
+        
+        self.assertEqual(Prediction.objects.count(), predictions)
+        self.assertFalse(get_user_model().objects.filter(username='benchmark').exists())
+
+class CompareTests(TestCase):
+    BASELINE = {
+        '200': {
+            'api.students_list': {'median_seconds': 0.1, 'peak_memory_bytes': 1000, 'queries': 3},
+            'engine.predict_cohort': {'skipped': 'no data for this benchmark'},
+        }
+    }
+    
+    def results(self, **metrics):
+        return {'200': {
+            'api.students_list': {'median_seconds': 0.1, 'peak_memory_bytes': 1000, 'queries': 3, **metrics},
+            'engine.predict_cohort': {'median_seconds': 5, 'peak_memory_bytes': 1, 'queries': 1},
+            'api.dashboard_stats': {'median_seconds': 5, 'peak_memory_bytes': 1, 'queries': 1},
+        }}
+    
+    def test_growth_within_threshold_passes(self):
+        self.assertEqual(compare(self.results(median_seconds=0.12), self.BASELINE, 0.25), [])
+    
+    def test_time_memory_and_query_regressions(self):
+        regressions = compare(
+            self.results(median_seconds=0.2, peak_memory_bytes=2000, queries=4), self.BASELINE, 0.25
+        )
+        
+        self.assertEqual(
+            {(r['benchmark'], r['metric']) for r in regressions},
+            {('api.students_list', metric) for metric in ('median_seconds', 'peak_memory_bytes', 'queries')}
+        )
+    
+    def test_skipped_and_new_benchmarks_are_ignored(self):
+        self.assertEqual(compare(self.results(), self.BASELINE, 0), [])
+
+# Run by ReplicaRoutingTests in a separate process configured with a replica
+REPLICA_SCENARIO = """
+import json, shutil, time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from rest_framework.test import APIClient
+from core.routers import read_from_replica
+from students.models import Student
+
+def add_student(n):
+    Student.objects.create(
+        student_id=f'R{n}', first_name='Read', last_name='Replica', email=f'r{n}@example.com',
+        department='Physics', admission_year=2020, admission_score=250
+    )
+
+add_student(1)
+connections.close_all()
+shutil.copy(settings.DATABASES['default']['NAME'], settings.DATABASES['replica']['NAME'])
+add_student(2)
+
+client = APIClient()
+client.force_authenticate(get_user_model()(username='replica', is_staff=True))
+count = lambda: len(client.get('/api/students/students/').data['results'])
+outcome = {'replica': count()}
+outcome['post'] = client.post('/api/students/students/', {
+    'student_id': 'R3', 'first_name': 'Read', 'last_name': 'Replica', 'email': 'r3@example.com',
+    'department': 'Physics', 'admission_year': 2020, 'admission_score': 250
+}, format='json').status_code
+outcome['after_write'] = count()
+pin = client.cookies['spps_primary_pin'].value
+client.cookies['spps_primary_pin'] = 'forged'
+outcome['forged_pin'] = count()
+time.sleep(1.5)
+client.cookies['spps_primary_pin'] = pin
+outcome['expired_pin'] = count()
+with read_from_replica():
+    outcome['context_manager'] = Student.objects.count()
+print(json.dumps(outcome))
+"""
+
+class ReplicaRoutingTests(SimpleTestCase):
+    """Routing between two SQLite files, as set up by DB_NAME and DB_REPLICA_NAME"""
+    
+    def test_reads_go_to_the_replica_until_the_client_writes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                'DJANGO_SETTINGS_MODULE': 'spps_project.settings',
+                'DB_ENGINE': 'sqlite',
+                'DB_NAME': os.path.join(directory, 'primary.sqlite3'),
+                'DB_REPLICA_NAME': os.path.join(directory, 'replica.sqlite3'),
+                'DB_REPLICA_STICKY_SECONDS': '1',
+            }
+            manage = os.path.join(settings.BASE_DIR, 'manage.py')
+            subprocess.run([sys.executable, manage, 'migrate', '-v0'], env=env, check=True, capture_output=True)
+            output = subprocess.run(
+                [sys.executable, manage, 'shell', '-c', REPLICA_SCENARIO],
+                env=env, check=True, capture_output=True, text=True
+            ).stdout
+        
+        self.assertEqual(json.loads(output.strip().splitlines()[-1]), {
+            'replica': 1,
+            'post': 201,
+            'after_write': 3,
+            'forged_pin': 1,
+            'expired_pin': 1,
+            'context_manager': 1,
+        })
+
+def database_environment(**env):
+    """os.environ without any database settings, plus `env`"""
+    return {key: value for key, value in os.environ.items() if not key.startswith(('DB_', 'SQLITE_'))} | env
+
+def probe_database_settings(**env):
+    """DATABASES['default'] and SQLITE_PRAGMAS as settings.py builds them from `env`"""
+    env = database_environment(**env)
+    output = subprocess.run(
+        [sys.executable, '-c', 'import json; from spps_project import settings; '
+         'print(json.dumps([settings.DATABASES["default"], settings.SQLITE_PRAGMAS], default=str))'],
+        cwd=settings.BASE_DIR, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+def postgres_environment():
+    """DB_* settings for TEST_POSTGRES_HOST, or None when no server or driver is available"""
+    if not os.environ.get('TEST_POSTGRES_HOST'):
+        return None
+    try:
+        import psycopg  # noqa: F401
+    except ImportError:
+        try:
+            import psycopg2  # noqa: F401
+        except ImportError:
+            return None
+    return {
+        'DB_ENGINE': 'postgresql',
+        'DB_HOST': os.environ['TEST_POSTGRES_HOST'],
+        'DB_PORT': os.environ.get('TEST_POSTGRES_PORT', '5432'),
+        'DB_NAME': os.environ.get('TEST_POSTGRES_NAME', 'spps'),
+        'DB_USER': os.environ.get('TEST_POSTGRES_USER', 'spps'),
+        'DB_PASSWORD': os.environ.get('TEST_POSTGRES_PASSWORD', ''),
+    }
+
+class DatabaseSettingsTests(SimpleTestCase):
+    """settings.DATABASES and the SQLite pragmas core.db applies to new connections"""
+    
+    def sqlite_connection(self, path):
+        from django.db.backends.sqlite3.base import DatabaseWrapper
+        wrapper = DatabaseWrapper({**connection.settings_dict, 'NAME': path}, alias='pragma_probe')
+        self.addCleanup(wrapper.close)
+        return wrapper
+    
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+    
+    def test_pragmas_are_applied_to_new_connections(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(SQLITE_PRAGMAS={
+            'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 1234, 'temp_store': 'MEMORY'
+        }):
+            wrapper = self.sqlite_connection(os.path.join(directory, 'pragmas.sqlite3'))
+            pragmas = ('journal_mode', 'synchronous', 'busy_timeout', 'temp_store')
+            self.assertEqual([self.pragma(wrapper, name) for name in pragmas], ['wal', 1, 1234, 2])
+            wrapper.close()
+    
+    def test_wal_is_opt_in(self):
+        self.assertNotIn('journal_mode', probe_database_settings()[1])
+        self.assertEqual(probe_database_settings(SQLITE_JOURNAL_MODE='WAL')[1]['journal_mode'], 'WAL')
+        
+        # The journal mode is stored in the file, so a manage.py run must not rewrite it
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'db.sqlite3')
+            subprocess.run(
+                [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'migrate', '-v0'],
+                env=database_environment(DB_NAME=path), check=True, capture_output=True
+            )
+            with open(path, 'rb') as f:
+                header = f.read(20)
+        self.assertEqual((header[18], header[19]), (1, 1))
+    
+    def test_postgresql_settings(self):
+        default, _ = probe_database_settings(
+            DB_ENGINE='postgresql', DB_HOST='db', DB_CONN_MAX_AGE='120', DB_STATEMENT_TIMEOUT_MS='5000'
+        )
+        self.assertEqual(default['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual((default['HOST'], default['CONN_MAX_AGE']), ('db', 120))
+        self.assertTrue(default['CONN_HEALTH_CHECKS'])
+        self.assertFalse(default['DISABLE_SERVER_SIDE_CURSORS'])
+        self.assertEqual(default['OPTIONS']['options'], '-c statement_timeout=5000')
+        
+        pooled, _ = probe_database_settings(DB_ENGINE='postgresql', DB_POOLER='pgbouncer')
+        self.assertTrue(pooled['DISABLE_SERVER_SIDE_CURSORS'])
+    
+    @unittest.skipUnless(postgres_environment(), 'needs TEST_POSTGRES_HOST and a PostgreSQL driver')
+    def test_postgresql_connection(self):
+        output = subprocess.run(
+            [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'shell', '-c',
+             'from django.db import connection\n'
+             'with connection.cursor() as cursor:\n'
+             '    cursor.execute("SHOW statement_timeout")\n'
+             '    print(cursor.fetchone()[0])'],
+            env=database_environment(**postgres_environment(), DB_STATEMENT_TIMEOUT_MS='5000'),
+            check=True, capture_output=True, text=True
+        ).stdout
+        self.assertEqual(output.strip().splitlines()[-1], '5s')
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CacheTests(TestCase):
+    """core.cache against the default local-memory backend"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        seed(students=10)
+        cls.student = Student.objects.filter(factors__isnull=False).order_by('pk').first()
+    
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model()(username='cache', is_staff=True))
+    
+    def student_payload(self):
+        return self.client.get(f'/api/students/students/{self.student.pk}/').data
+    
+    def lookups(self, namespace):
+        return {
+            result: registry.cache_lookups[(namespace, result)] for result in ('hit', 'miss')
+        }
+    
+    def test_student_payload_is_cached(self):
+        first = self.student_payload()
+        second = self.student_payload()
+        
+        self.assertEqual(first, second)
+        self.assertEqual(self.lookups('student_payload'), {'hit': 1, 'miss': 1})
+    
+    def test_list_page_shares_entries_with_detail(self):
+        self.client.get('/api/students/students/')
+        self.student_payload()
+        self.assertEqual(self.lookups('student_payload'), {'hit': 1, 'miss': 10})
+    
+    def test_hits_load_no_details(self):
+        self.client.get('/api/students/students/')
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/api/students/students/')
+        
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(len(captured), 1)
+        self.assertNotIn('student_semester_summaries', captured[0]['sql'])
+        
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get(f'/api/students/students/{self.student.pk}/gpa/')
+        self.assertEqual(len(captured), 1)
+        self.assertFalse(any('"results"' in query['sql'] for query in captured))
+    
+    def test_misses_load_details_once(self):
+        self.student_payload()
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get('/api/students/students/')
+        
+        # The page, then GPAs and factors, results and their courses for the nine misses
+        self.assertEqual(len(captured), 4)
+        self.assertEqual(self.lookups('student_payload'), {'hit': 1, 'miss': 10})
+    
+    def test_result_save_invalidates_the_student(self):
+        self.student_payload()
+        result = self.student.results.order_by('pk').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            result.score = 3
+            result.save()
+        
+        payload = self.student_payload()
+        self.assertEqual(next(r['score'] for r in payload['results'] if r['id'] == result.pk), 3)
+        self.assertEqual(payload['current_gpa'], self.student.calculate_gpa())
+    
+    def test_factors_save_invalidates_the_student(self):
+        self.student_payload()
+        factors = self.student.factors
+        with self.captureOnCommitCallbacks(execute=True):
+            factors.study_hours_per_week = 39
+            factors.save()
+        
+        self.assertEqual(self.student_payload()['factors']['study_hours_per_week'], 39)
+    
+    def test_other_students_stay_cached(self):
+        other = Student.objects.exclude(pk=self.student.pk).order_by('pk').first()
+        self.client.get(f'/api/students/students/{other.pk}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.factors.save()
+        
+        self.client.get(f'/api/students/students/{other.pk}/')
+        self.assertEqual(self.lookups('student_payload'), {'hit': 1, 'miss': 1})
+    
+    def test_prediction_save_invalidates_statistics(self):
+        before = PredictionEngine.get_prediction_statistics()
+        self.assertEqual(PredictionEngine.get_prediction_statistics(), before)
+        with self.captureOnCommitCallbacks(execute=True):
+            PredictionEngine.predict_cgpa(self.student.student_id, 'Another')
+        
+        after = PredictionEngine.get_prediction_statistics()
+        self.assertEqual(after['total_predictions'], before['total_predictions'] + 1)
+        self.assertEqual(self.lookups('prediction_statistics'), {'hit': 1, 'miss': 2})
+    
+    def test_evicted_version_never_revives_old_entries(self):
+        self.student_payload()
+        token = get_versions([f'student:{self.student.pk}'])[f'student:{self.student.pk}']
+        cache.delete(f'core:version:student:{self.student.pk}')
+        
+        self.assertNotEqual(get_versions([f'student:{self.student.pk}'])[f'student:{self.student.pk}'], token)
+        self.student_payload()
+        self.assertEqual(self.lookups('student_payload'), {'hit': 0, 'miss': 2})
+    
+    def test_lookups_are_exposed_as_metrics(self):
+        self.student_payload()
+        self.student_payload()
+        
+        metrics = self.client.get('/api/metrics/').content.decode()
+        self.assertIn('spps_cache_lookups_total{namespace="student_payload",result="hit"} 1', metrics)
+        self.assertIn('spps_cache_lookups_total{namespace="student_payload",result="miss"} 1', metrics)
+
+@unittest.skipUnless(fakeredis or os.environ.get('TEST_REDIS_URL'), 'needs fakeredis or TEST_REDIS_URL')
+@override_settings(CACHES=redis_cache())
+class RedisCacheTests(CacheTests):
+    """The same behaviour through Django's RedisCache backend"""
+    
+    def test_backend_is_redis(self):
+        self.assertEqual(type(cache._cache).__name__, 'RedisCacheClient')
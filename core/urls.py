@@ -3,4 +3,7 @@ from . import views
 
 urlpatterns = [
     path('dashboard/', views.dashboard_stats, name='dashboard_stats'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('profiles/', views.profiles, name='profiles'),
+    path('profiles/<str:profile_id>/', views.download_profile, name='download_profile'),
 ]
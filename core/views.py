@@ -1,26 +1,37 @@
+import os
+from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from django.http import FileResponse, HttpResponse
 from rest_framework.response import Response
+from django.db.models import Count, Q
 from students.models import Student, Result
 from predictions.models import Prediction
+from .cache import get_dashboard_stats
+from .metrics import registry
+from .profiling import list_profiles, profile_path
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def dashboard_stats(request):
     """Get overall dashboard statistics"""
+    return Response(get_dashboard_stats(build_dashboard_stats))
+
+def build_dashboard_stats():
+    """Compute the dashboard payload; served from the cache by dashboard_stats"""
+    counts = Prediction.objects.current().aggregate(
+        total_predictions=Count('id'),
+        at_risk_students=Count('id', filter=Q(risk_level='at_risk')),
+        high_achievers=Count('id', filter=Q(risk_level='high_achiever'))
+    )
     
-    total_students = Student.objects.count()
-    total_predictions = Prediction.objects.count()
-    at_risk_count = Prediction.objects.filter(risk_level='at_risk').count()
-    high_achievers = Prediction.objects.filter(risk_level='high_achiever').count()
-    
-    recent_predictions = Prediction.objects.order_by('-predicted_at')[:5]
+    recent_predictions = Prediction.objects.select_related('student').order_by('-predicted_at')[:5]
     
-    return Response({
-        'total_students': total_students,
-        'total_predictions': total_predictions,
-        'at_risk_students': at_risk_count,
-        'high_achievers': high_achievers,
+    return {
+        'total_students': Student.objects.count(),
+        'total_predictions': counts['total_predictions'],
+        'at_risk_students': counts['at_risk_students'],
+        'high_achievers': counts['high_achievers'],
         'recent_predictions': [{
             'id': p.id,
             'student_id': p.student.student_id,
@@ -29,4 +40,28 @@ def dashboard_stats(request):
             'risk_level': p.risk_level,
             'predicted_at': p.predicted_at
         } for p in recent_predictions]
-    })
+    }
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics(request):
+    """Per-view request metrics in the Prometheus text format (admin only)"""
+    return HttpResponse(
+        registry.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profiles(request):
+    """Saved profiles of the engine, CSV import and report code paths, newest first (admin only)"""
+    return Response(list_profiles())
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def download_profile(request, profile_id):
+    """Download a saved profile: stage timings as JSON, or ?kind=prof for the cProfile dump"""
+    kind = request.query_params.get('kind', 'json')
+    path = profile_path(profile_id, kind)
+    if path is None:
+        return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=os.path.basename(path))
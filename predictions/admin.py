@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Prediction, Intervention
+from .models import Prediction, Intervention, PredictionJob, ReportRender, StudentFeatureVector
 
 @admin.register(Prediction)
 class PredictionAdmin(admin.ModelAdmin):
@@ -12,3 +12,21 @@ class PredictionAdmin(admin.ModelAdmin):
 class InterventionAdmin(admin.ModelAdmin):
     list_display = ['prediction', 'intervention_type', 'priority', 'status']
     list_filter = ['intervention_type', 'priority', 'status']
+
+@admin.register(PredictionJob)
+class PredictionJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'status', 'semester', 'total', 'processed', 'failed', 'at_risk', 'created_at']
+    list_filter = ['status']
+    readonly_fields = ['created_at', 'started_at', 'finished_at']
+
+@admin.register(StudentFeatureVector)
+class StudentFeatureVectorAdmin(admin.ModelAdmin):
+    list_display = ['student', 'first_semester_gpa', 'attendance_percentage', 'admission_score', 'updated_at']
+    search_fields = ['student__student_id']
+    readonly_fields = ['updated_at']
+
+@admin.register(ReportRender)
+class ReportRenderAdmin(admin.ModelAdmin):
+    list_display = ['fingerprint', 'prediction', 'status', 'updated_at']
+    list_filter = ['status']
+    readonly_fields = ['updated_at']
@@ -1,5 +1,25 @@
+import operator
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, F, Q, QuerySet
+from django.utils import timezone
+from core.cache import (
+    get_prediction_statistics, invalidate_dashboard_stats, invalidate_prediction_statistics
+)
+from core.profiling import profiled, stage
 from students.models import Student, AdditionalFactors
-from .models import Prediction, Intervention
+from .models import Prediction, Intervention, StudentFeatureVector
+
+# Comparisons available to PredictionEngine.INTERVENTION_RULES
+RULE_OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
 
 class PredictionEngine:
     """
@@ -17,6 +37,65 @@ class PredictionEngine:
         'socioeconomic': 0.10,          # 10% - Support system
     }
     
+    # StudentFeatureVector column holding each weighted input
+    FEATURE_FIELDS = {
+        'first_semester_gpa': 'gpa_feature',
+        'attendance': 'attendance_feature',
+        'assignments': 'assignment_feature',
+        'study_hours': 'study_feature',
+        'admission_score': 'admission_feature',
+        'socioeconomic': 'socioeconomic_feature',
+    }
+    
+    # StudentFeatureVector columns rewritten on refresh
+    VECTOR_FIELDS = [
+        'first_semester_gpa', 'attendance_percentage', 'assignment_average',
+        'study_hours_per_week', 'admission_score', 'socioeconomic_status',
+    ] + list(FEATURE_FIELDS.values())
+    
+    # Prediction snapshot field matching each StudentFeatureVector input
+    SNAPSHOT_FIELDS = {
+        'first_semester_gpa': 'first_semester_gpa',
+        'attendance_percentage': 'attendance_percentage',
+        'assignment_average': 'assignment_average',
+        'study_hours': 'study_hours_per_week',
+        'admission_score': 'admission_score',
+        'socioeconomic_score': 'socioeconomic_feature',
+    }
+    
+    # Rows written per INSERT when scoring a cohort
+    BATCH_SIZE = 500
+    INTERVENTION_BATCH_SIZE = 2000
+    
+    # Interventions recommended for at-risk students, checked in order against
+    # AdditionalFactors fields; a rule without a field always applies
+    INTERVENTION_RULES = getattr(settings, 'PREDICTION_INTERVENTION_RULES', [
+        {
+            'field': 'attendance_percentage', 'op': '<', 'value': 75,
+            'type': 'academic_counseling', 'priority': 'high',
+            'description': 'Address attendance issues and identify barriers to regular class participation'
+        },
+        {
+            'field': 'assignment_average', 'op': '<', 'value': 60,
+            'type': 'tutoring', 'priority': 'high',
+            'description': 'Provide subject-specific tutoring to improve assignment performance'
+        },
+        {
+            'field': 'study_hours_per_week', 'op': '<', 'value': 10,
+            'type': 'study_skills', 'priority': 'medium',
+            'description': 'Enroll in time management and study skills workshop'
+        },
+        {
+            'field': 'socioeconomic_status', 'op': '==', 'value': 'low',
+            'type': 'financial_aid', 'priority': 'medium',
+            'description': 'Connect with financial aid office for support resources'
+        },
+        {
+            'type': 'mentorship', 'priority': 'medium',
+            'description': 'Assign peer mentor for academic and social support'
+        },
+    ])
+    
     @classmethod
     def normalize_score(cls, value, min_val, max_val):
         """Convert any score to 0-100 scale"""
@@ -31,67 +110,149 @@ class PredictionEngine:
         return mapping.get(status, 50)
     
     @classmethod
+    @profiled('predict_cgpa')
     def predict_cgpa(cls, student_id, semester='Current'):
         """
         Generate prediction for a student using weighted scoring approach
         """
         try:
-            student = Student.objects.get(student_id=student_id)
-            factors = student.factors
-            
-            # Extract and normalize input factors
-            first_sem_gpa = student.calculate_gpa(semester='First')
-            gpa_score = cls.normalize_score(first_sem_gpa, 0, 5.0)  # Already 0-100
-            
-            attendance_score = factors.attendance_percentage
-            assignment_score = factors.assignment_average
-            study_score = cls.normalize_score(factors.study_hours_per_week, 0, 40)
-            admission_score = cls.normalize_score(student.admission_score, 100, 400)
-            socio_score = cls.calculate_socioeconomic_score(factors.socioeconomic_status)
-            
-            # Calculate weighted composite score
-            composite_score = (
-                gpa_score * cls.WEIGHTS['first_semester_gpa'] +
-                attendance_score * cls.WEIGHTS['attendance'] +
-                assignment_score * cls.WEIGHTS['assignments'] +
-                study_score * cls.WEIGHTS['study_hours'] +
-                admission_score * cls.WEIGHTS['admission_score'] +
-                socio_score * cls.WEIGHTS['socioeconomic']
-            )
-            
-            # Convert composite score back to CGPA scale (0-5)
-            predicted_cgpa = (composite_score / 100) * 5.0
-            predicted_cgpa = round(predicted_cgpa, 2)
-            
-            # Determine risk level and confidence
-            risk_level, confidence = cls.classify_risk(predicted_cgpa, composite_score)
+            with stage('fetch'):
+                vector = cls.get_feature_vector(student_id)
+            with stage('normalize'):
+                features = cls.feature_matrix([vector])
+            with stage('score'):
+                composite_scores, raw_cgpas = cls.score_features(features)
+                prediction = cls.build_prediction(vector, composite_scores[0], raw_cgpas[0], semester)
             
             # Create prediction record
-            prediction = Prediction.objects.create(
-                student=student,
-                predicted_cgpa=predicted_cgpa,
-                risk_level=risk_level,
-                confidence_score=confidence,
-                first_semester_gpa=first_sem_gpa,
-                attendance_percentage=factors.attendance_percentage,
-                assignment_average=factors.assignment_average,
-                study_hours=factors.study_hours_per_week,
-                admission_score=student.admission_score,
-                socioeconomic_score=socio_score,
-                semester=semester
-            )
-            
-            # Generate interventions for at-risk students
-            if risk_level == 'at_risk':
-                cls.generate_interventions(prediction, factors)
+            with stage('persist'):
+                prediction.student = vector.student
+                prediction.save()
+                
+                # Generate interventions for at-risk students
+                if prediction.risk_level == 'at_risk':
+                    cls.generate_interventions(prediction, vector)
             
             return prediction
-            
+        
         except Student.DoesNotExist:
             raise ValueError(f"Student {student_id} not found")
         except Exception as e:
             raise ValueError(f"Prediction failed: {str(e)}")
     
+    @classmethod
+    def get_feature_vector(cls, student_id):
+        """The stored feature vector for a student, built first if it is missing"""
+        vectors = StudentFeatureVector.objects.select_related('student').filter(
+            student__student_id=student_id
+        )
+        vector = vectors.first()
+        if vector is None:
+            student = Student.objects.get(student_id=student_id)
+            if not cls.refresh_feature_vectors([student.pk]):
+                raise AdditionalFactors.DoesNotExist("Student has no additional factors recorded")
+            vector = vectors.get()
+        return vector
+    
+    @classmethod
+    def build_feature_vector(cls, student, factors):
+        """Normalize one student's inputs into an unsaved StudentFeatureVector"""
+        first_sem_gpa = student.calculate_gpa(semester='First')
+        return StudentFeatureVector(
+            student=student,
+            first_semester_gpa=first_sem_gpa,
+            attendance_percentage=factors.attendance_percentage,
+            assignment_average=factors.assignment_average,
+            study_hours_per_week=factors.study_hours_per_week,
+            admission_score=student.admission_score,
+            socioeconomic_status=factors.socioeconomic_status,
+            gpa_feature=cls.normalize_score(first_sem_gpa, 0, 5.0),  # Already 0-100
+            attendance_feature=factors.attendance_percentage,
+            assignment_feature=factors.assignment_average,
+            study_feature=cls.normalize_score(factors.study_hours_per_week, 0, 40),
+            admission_feature=cls.normalize_score(student.admission_score, 100, 400),
+            socioeconomic_feature=cls.calculate_socioeconomic_score(factors.socioeconomic_status)
+        )
+    
+    @classmethod
+    def refresh_feature_vectors(cls, student_ids=None, batch_size=None):
+        """
+        Recompute stored feature vectors for the given student pks (everyone
+        when None). Students without additional factors lose their vector.
+        Returns the number of vectors written.
+        """
+        batch_size = batch_size or cls.BATCH_SIZE
+        if student_ids is None:
+            student_ids = list(Student.objects.order_by('pk').values_list('pk', flat=True))
+        student_ids = list(student_ids)
+        
+        written = 0
+        for start in range(0, len(student_ids), batch_size):
+            vectors = []
+            without_factors = []
+            for student in Student.objects.with_gpa(semesters=['First']).filter(
+                pk__in=student_ids[start:start + batch_size]
+            ).select_related('factors'):
+                factors = getattr(student, 'factors', None)
+                if factors is None:
+                    without_factors.append(student.pk)
+                else:
+                    vectors.append(cls.build_feature_vector(student, factors))
+            
+            if without_factors:
+                StudentFeatureVector.objects.filter(student_id__in=without_factors).delete()
+            StudentFeatureVector.objects.bulk_create(
+                vectors,
+                update_conflicts=True,
+                unique_fields=['student'],
+                update_fields=cls.VECTOR_FIELDS + ['needs_rescore', 'updated_at']
+            )
+            written += len(vectors)
+        
+        return written
+    
+    @classmethod
+    def feature_matrix(cls, vectors):
+        """Stack feature vectors into an n x 6 array, columns in WEIGHTS order"""
+        fields = [cls.FEATURE_FIELDS[factor] for factor in cls.WEIGHTS]
+        return np.array(
+            [[getattr(vector, field) for field in fields] for vector in vectors], dtype=float
+        ).reshape(-1, len(fields))
+    
+    @classmethod
+    def score_features(cls, features):
+        """
+        Composite scores (0-100) and unrounded CGPAs for a feature matrix.
+        Terms are added in WEIGHTS order so every path gets identical floats.
+        """
+        composite_scores = sum(
+            features[:, column] * weight for column, weight in enumerate(cls.WEIGHTS.values())
+        )
+        
+        # Convert composite score back to CGPA scale (0-5)
+        return composite_scores, (composite_scores / 100) * 5.0
+    
+    @classmethod
+    def build_prediction(cls, vector, composite_score, raw_cgpa, semester):
+        """Unsaved Prediction for one scored feature vector"""
+        # Python's round() rather than np.round() so scalar and array scores agree
+        predicted_cgpa = round(float(raw_cgpa), 2)
+        risk_level, confidence = cls.classify_risk(predicted_cgpa, float(composite_score))
+        
+        return Prediction(
+            student_id=vector.student_id,
+            predicted_cgpa=predicted_cgpa,
+            risk_level=risk_level,
+            confidence_score=confidence,
+            first_semester_gpa=vector.first_semester_gpa,
+            attendance_percentage=vector.attendance_percentage,
+            assignment_average=vector.assignment_average,
+            study_hours=vector.study_hours_per_week,
+            admission_score=vector.admission_score,
+            socioeconomic_score=vector.socioeconomic_feature,
+            semester=semester
+        )
+    
     @classmethod
     def classify_risk(cls, predicted_cgpa, composite_score):
         """
@@ -108,56 +269,239 @@ class PredictionEngine:
     @classmethod
     def generate_interventions(cls, prediction, factors):
         """Generate recommended interventions for at-risk students"""
-        interventions = []
-        
-        if factors.attendance_percentage < 75:
-            interventions.append({
-                'type': 'academic_counseling',
-                'description': 'Address attendance issues and identify barriers to regular class participation',
-                'priority': 'high'
-            })
-        
-        if factors.assignment_average < 60:
-            interventions.append({
-                'type': 'tutoring',
-                'description': 'Provide subject-specific tutoring to improve assignment performance',
-                'priority': 'high'
-            })
-        
-        if factors.study_hours_per_week < 10:
-            interventions.append({
-                'type': 'study_skills',
-                'description': 'Enroll in time management and study skills workshop',
-                'priority': 'medium'
-            })
-        
-        if factors.socioeconomic_status == 'low':
-            interventions.append({
-                'type': 'financial_aid',
-                'description': 'Connect with financial aid office for support resources',
-                'priority': 'medium'
-            })
-        
-        interventions.append({
-            'type': 'mentorship',
-            'description': 'Assign peer mentor for academic and social support',
-            'priority': 'medium'
-        })
-        
-        for intervention_data in interventions:
-            Intervention.objects.create(
-                prediction=prediction,
-                intervention_type=intervention_data['type'],
-                description=intervention_data['description'],
-                priority=intervention_data['priority']
+        Intervention.objects.bulk_create(cls.build_interventions(prediction, factors))
+    
+    @classmethod
+    def build_interventions(cls, prediction, factors):
+        """Build (unsaved) recommended interventions for an at-risk prediction"""
+        return cls.build_cohort_interventions([(prediction, factors)])
+    
+    @classmethod
+    def build_cohort_interventions(cls, at_risk):
+        """
+        Build (unsaved) interventions for many (prediction, factors) pairs.
+        Each rule in INTERVENTION_RULES is evaluated once over the whole batch;
+        every prediction gets its interventions in rule order.
+        """
+        if not at_risk:
+            return []
+        
+        columns = {}
+        matches = []
+        for rule in cls.INTERVENTION_RULES:
+            if 'field' not in rule:
+                matches.append(np.ones(len(at_risk), dtype=bool))
+                continue
+            if rule['field'] not in columns:
+                columns[rule['field']] = np.array([getattr(factors, rule['field']) for _, factors in at_risk])
+            matches.append(np.asarray(RULE_OPERATORS[rule['op']](columns[rule['field']], rule['value'])))
+        
+        predictions, rules = np.nonzero(np.column_stack(matches))
+        return [
+            Intervention(
+                prediction=at_risk[i][0],
+                intervention_type=cls.INTERVENTION_RULES[r]['type'],
+                description=cls.INTERVENTION_RULES[r]['description'],
+                priority=cls.INTERVENTION_RULES[r]['priority']
             )
+            for i, r in zip(predictions.tolist(), rules.tolist())
+        ]
     
     @classmethod
-    def get_prediction_statistics(cls):
-        """Generate summary statistics across all predictions"""
-        predictions = Prediction.objects.all()
+    def predict_cohort(cls, students, semester='Current', batch_size=None, on_batch=None):
+        """
+        Generate predictions for many students at once.
         
-        total = predictions.count()
+        `students` is either a Student queryset or an iterable of student_id
+        strings. Each batch is one read of stored feature vectors, scored as a
+        NumPy array by the same code as predict_cgpa, then written back with
+        set-based queries. Missing vectors are built on the way.
+        `on_batch(predictions, errors)` is called after each batch is written.
+        Returns: {'predictions': [...], 'errors': [...]}
+        """
+        batch_size = batch_size or cls.BATCH_SIZE
+        
+        if isinstance(students, QuerySet):
+            keys = list(students.order_by('pk').values_list('pk', flat=True))
+            lookup = 'pk'
+        else:
+            keys = list(dict.fromkeys(students))
+            lookup = 'student_id'
+        
+        predictions = []
+        errors = []
+        
+        for start in range(0, len(keys), batch_size):
+            chunk = keys[start:start + batch_size]
+            vectors = cls._load_feature_vectors(lookup, chunk)
+            
+            batch_errors = []
+            missing = [key for key in chunk if key not in vectors]
+            if missing:
+                found = {
+                    key: (pk, student_id)
+                    for key, pk, student_id in Student.objects.filter(
+                        **{f'{lookup}__in': missing}
+                    ).values_list(lookup, 'pk', 'student_id')
+                }
+                cls.refresh_feature_vectors([pk for pk, _ in found.values()])
+                vectors.update(cls._load_feature_vectors(lookup, list(found)))
+                for key in missing:
+                    if key not in found:
+                        batch_errors.append(f"Student {key} not found")
+                    elif key not in vectors:
+                        batch_errors.append(f"Student {found[key][1]}: no additional factors recorded")
+            
+            scored = [vectors[key] for key in chunk if key in vectors]
+            batch_predictions = cls._score_batch(scored, semester) if scored else []
+            predictions.extend(batch_predictions)
+            errors.extend(batch_errors)
+            
+            if on_batch:
+                on_batch(batch_predictions, batch_errors)
+        
+        return {'predictions': predictions, 'errors': errors}
+    
+    @classmethod
+    def rescore_dirty(cls, semester='Current', batch_size=None, on_batch=None):
+        """
+        Re-predict students whose feature vector changed since the last run.
+        Students whose current prediction for `semester` already snapshots the
+        same inputs are skipped rather than given an identical new prediction.
+        The dirty flag clears once `semester` is up to date; other semesters
+        are refreshed with a full cohort job.
+        `on_batch(predictions, errors, skipped)` is called after each batch.
+        Returns: {'predictions': [...], 'errors': [...], 'skipped': int}
+        """
+        batch_size = batch_size or cls.BATCH_SIZE
+        # Vectors refreshed after this stay dirty for the next run
+        started = timezone.now()
+        keys = list(
+            StudentFeatureVector.objects.filter(needs_rescore=True).order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        
+        predictions = []
+        skipped = 0
+        
+        for start in range(0, len(keys), batch_size):
+            chunk = keys[start:start + batch_size]
+            snapshots = {
+                student_id: tuple(snapshot)
+                for student_id, *snapshot in Prediction.objects.current().filter(
+                    student_id__in=chunk, semester=semester
+                ).values_list('student_id', *cls.SNAPSHOT_FIELDS)
+            }
+            
+            vectors = list(StudentFeatureVector.objects.filter(pk__in=chunk))
+            changed = [
+                vector for vector in vectors
+                if snapshots.get(vector.student_id) != cls.input_fingerprint(vector)
+            ]
+            batch_predictions = cls._score_batch(changed, semester) if changed else []
+            
+            # Every vector in the chunk now matches its prediction for `semester`
+            StudentFeatureVector.objects.filter(
+                pk__in=chunk, updated_at__lte=started
+            ).update(needs_rescore=False)
+            
+            predictions.extend(batch_predictions)
+            skipped += len(chunk) - len(changed)
+            
+            if on_batch:
+                on_batch(batch_predictions, [], len(chunk) - len(changed))
+        
+        return {'predictions': predictions, 'errors': [], 'skipped': skipped}
+    
+    @classmethod
+    def input_fingerprint(cls, vector):
+        """A vector's inputs in the form Prediction snapshots them, in SNAPSHOT_FIELDS order"""
+        return tuple(getattr(vector, field) for field in cls.SNAPSHOT_FIELDS.values())
+    
+    @classmethod
+    def _load_feature_vectors(cls, lookup, keys):
+        """Stored feature vectors of the students whose `lookup` field is in keys, keyed by it"""
+        vectors = StudentFeatureVector.objects.filter(**{f'student__{lookup}__in': keys})
+        if lookup == 'pk':
+            return {vector.student_id: vector for vector in vectors}
+        return {
+            vector.student_number: vector
+            for vector in vectors.annotate(student_number=F('student__student_id'))
+        }
+    
+    @classmethod
+    def _score_batch(cls, vectors, semester):
+        """Score and persist one batch of feature vectors"""
+        composite_scores, raw_cgpas = cls.score_features(cls.feature_matrix(vectors))
+        
+        predictions = []
+        at_risk = []
+        for vector, composite_score, raw_cgpa in zip(vectors, composite_scores, raw_cgpas):
+            prediction = cls.build_prediction(vector, composite_score, raw_cgpa, semester)
+            predictions.append(prediction)
+            if prediction.risk_level == 'at_risk':
+                at_risk.append((prediction, vector))
+        
+        with transaction.atomic():
+            Prediction.supersede([vector.student_id for vector in vectors], semester)
+            Prediction.objects.bulk_create(predictions)
+            Intervention.objects.bulk_create(
+                cls.build_cohort_interventions(at_risk), batch_size=cls.INTERVENTION_BATCH_SIZE
+            )
+            # bulk_create sends no post_save, so the cached figures are invalidated here
+            invalidate_dashboard_stats()
+            invalidate_prediction_statistics()
+        
+        return predictions
+    
+    # Fields get_prediction_statistics can group by
+    STATISTICS_GROUP_FIELDS = ['semester', 'student__department', 'student__admission_year']
+    
+    @classmethod
+    def get_prediction_statistics(cls, group_by=None, predictions=None):
+        """
+        Generate summary statistics across current predictions (or the given
+        queryset) in one aggregate query, optionally broken down by any of
+        STATISTICS_GROUP_FIELDS. Statistics over current predictions are cached.
+        """
+        group_by = [group_by] if isinstance(group_by, str) else list(group_by or [])
+        unknown = set(group_by) - set(cls.STATISTICS_GROUP_FIELDS)
+        if unknown:
+            raise ValueError(f"Cannot group statistics by: {', '.join(sorted(unknown))}")
+        
+        if predictions is None:
+            return get_prediction_statistics(
+                group_by, lambda: cls._compute_statistics(Prediction.objects.current(), group_by)
+            )
+        return cls._compute_statistics(predictions, group_by)
+    
+    @classmethod
+    def _compute_statistics(cls, predictions, group_by):
+        risk_levels = [level for level, _ in Prediction.RISK_LEVELS]
+        aggregates = {
+            'total': Count('id'),
+            'average_cgpa': Avg('predicted_cgpa'),
+            **{level: Count('id', filter=Q(risk_level=level)) for level in risk_levels}
+        }
+        
+        if not group_by:
+            return cls._format_statistics(predictions.aggregate(**aggregates), risk_levels)
+        
+        rows = predictions.order_by().values(*group_by).annotate(**aggregates).order_by(*group_by)
+        return {
+            'group_by': group_by,
+            'groups': [
+                {
+                    **{field: row[field] for field in group_by},
+                    **cls._format_statistics(row, risk_levels)
+                }
+                for row in rows
+            ]
+        }
+    
+    @staticmethod
+    def _format_statistics(row, risk_levels):
+        total = row['total']
         if total == 0:
             return {
                 'total_predictions': 0,
@@ -165,17 +509,11 @@ class PredictionEngine:
                 'risk_distribution': {}
             }
         
-        risk_counts = {
-            'high_achiever': predictions.filter(risk_level='high_achiever').count(),
-            'average': predictions.filter(risk_level='average').count(),
-            'at_risk': predictions.filter(risk_level='at_risk').count(),
-        }
-        
-        avg_cgpa = sum(p.predicted_cgpa for p in predictions) / total
+        risk_counts = {level: row[level] for level in risk_levels}
         
         return {
             'total_predictions': total,
-            'average_predicted_cgpa': round(avg_cgpa, 2),
+            'average_predicted_cgpa': round(row['average_cgpa'], 2),
             'risk_distribution': risk_counts,
             'risk_percentages': {
                 key: round((count / total) * 100, 1)
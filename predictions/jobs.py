@@ -0,0 +1,214 @@
+import multiprocessing
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from core.profiling import request_profiling, requested_mode
+from students.models import Student
+from .engine import PredictionEngine
+from .models import Prediction, PredictionJob, ReportRender, StudentFeatureVector
+from .reports import PredictionReportGenerator
+
+# Background workers shared by every request served by this process
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'PREDICTION_JOB_WORKERS', 2),
+    thread_name_prefix='prediction-job'
+)
+
+_report_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'REPORT_WORKERS', 2),
+    thread_name_prefix='prediction-report'
+)
+
+# Cohort report rendering is CPU-bound, so it gets processes; created on first use
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+# Only the first errors are kept on the job row so it cannot grow without bound
+MAX_STORED_ERRORS = 500
+
+# Identifies this process's pool on the jobs it queues; the suffix tells apart a restart that reuses the pid
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# A running job with no progress, or a queued job whose pool made none, for this long lost its worker
+STALE_JOB_AFTER = timedelta(seconds=getattr(settings, 'PREDICTION_JOB_STALE_SECONDS', 1800))
+
+# A render still pending after this long was lost with its worker and may be queued again
+REPORT_RENDER_TIMEOUT = timedelta(seconds=getattr(settings, 'REPORT_RENDER_TIMEOUT', 600))
+
+def submit_prediction_job(job):
+    """Queue a job for the worker pool once the creating transaction commits"""
+    recover_stale_jobs()
+    job.worker = WORKER_ID
+    job.save(update_fields=['worker', 'updated_at'])
+    transaction.on_commit(lambda: _executor.submit(run_prediction_job, job.pk))
+
+def heartbeat_queued_jobs():
+    """
+    Mark this pool alive on the jobs it has queued. A job waiting behind long
+    runs stays fresh as long as those runs progress; it only goes stale once
+    its pool stops, which a pending job cannot tell apart from waiting otherwise.
+    """
+    PredictionJob.objects.filter(status='pending', worker=WORKER_ID).update(updated_at=timezone.now())
+
+def recover_stale_jobs(older_than=None):
+    """
+    Fail running jobs with no progress, and queued jobs whose pool made no
+    progress, for `older_than` (default STALE_JOB_AFTER) so they do not look
+    active forever. Returns how many failed.
+    """
+    now = timezone.now()
+    cutoff = now - (STALE_JOB_AFTER if older_than is None else older_than)
+    # A pending job no pool has taken yet has no heartbeat to miss
+    stale = PredictionJob.objects.filter(
+        Q(status='running') | Q(status='pending') & ~Q(worker=''), updated_at__lt=cutoff
+    )
+    recovered = 0
+    for job in stale:
+        # Matching updated_at leaves alone a job that progressed since it was read
+        recovered += PredictionJob.objects.filter(
+            pk=job.pk, status=job.status, updated_at=job.updated_at
+        ).update(
+            status='failed',
+            errors=job.errors + [f"Job interrupted: no progress since {job.updated_at.isoformat()}"],
+            finished_at=now,
+            updated_at=now
+        )
+    return recovered
+
+def get_job_students(filters):
+    """
+    Resolve job filters to something PredictionEngine.predict_cohort accepts:
+    a plain list of student IDs, or a Student queryset when other filters apply
+    """
+    # Repeated IDs are scored once, so they must not be counted twice either
+    student_ids = list(dict.fromkeys(filters.get('student_ids') or []))
+    queryset = Student.objects.all()
+    
+    if filters.get('department'):
+        queryset = queryset.filter(department=filters['department'])
+    if filters.get('admission_year'):
+        queryset = queryset.filter(admission_year=filters['admission_year'])
+    
+    if student_ids:
+        if len(filters) == 1:
+            return student_ids
+        queryset = queryset.filter(student_id__in=student_ids)
+    
+    return queryset
+
+def run_prediction_job(job_id):
+    """
+    Score every student selected by a PredictionJob, recording progress as it
+    goes. Jobs with the dirty_only filter run PredictionEngine.rescore_dirty.
+    """
+    try:
+        # Claim the job so a copy queued twice, or one already failed as stale, does not run
+        now = timezone.now()
+        if not PredictionJob.objects.filter(pk=job_id, status='pending').update(
+            status='running', started_at=now, updated_at=now
+        ):
+            return
+        heartbeat_queued_jobs()
+        job = PredictionJob.objects.get(pk=job_id)
+        
+        if job.filters.get('dirty_only'):
+            job.total = StudentFeatureVector.objects.filter(needs_rescore=True).count()
+        else:
+            students = get_job_students(job.filters)
+            job.total = len(students) if isinstance(students, list) else students.count()
+        job.save(update_fields=['total', 'updated_at'])
+        
+        def record_progress(predictions, errors, skipped=0):
+            job.processed += len(predictions) + skipped
+            job.failed += len(errors)
+            job.skipped += skipped
+            job.at_risk += sum(1 for p in predictions if p.risk_level == 'at_risk')
+            job.errors.extend(errors[:MAX_STORED_ERRORS - len(job.errors)])
+            job.save(update_fields=['processed', 'failed', 'skipped', 'at_risk', 'errors', 'updated_at'])
+            heartbeat_queued_jobs()
+        
+        try:
+            if job.filters.get('dirty_only'):
+                PredictionEngine.rescore_dirty(job.semester, on_batch=record_progress)
+            else:
+                PredictionEngine.predict_cohort(students, job.semester, on_batch=record_progress)
+            job.status = 'completed'
+        except Exception as e:
+            job.status = 'failed'
+            job.errors.append(f"Job failed: {str(e)}")
+        
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'errors', 'finished_at', 'updated_at'])
+    finally:
+        connection.close()
+
+def get_report_status(prediction):
+    """
+    Report status for a prediction: 'ready' with its file path when an
+    up-to-date PDF exists, otherwise 'pending', 'failed' or 'missing'
+    """
+    fingerprint = PredictionReportGenerator.report_fingerprint(prediction)
+    filepath = PredictionReportGenerator.get_cached_report(prediction, fingerprint)
+    if filepath:
+        return {'status': 'ready', 'file_path': filepath}
+    
+    render = ReportRender.objects.filter(fingerprint=fingerprint).first()
+    if render is None:
+        return {'status': 'missing'}
+    if render.status == 'failed':
+        return {'status': 'failed', 'error': render.error}
+    if render.updated_at < timezone.now() - REPORT_RENDER_TIMEOUT:
+        return {'status': 'missing'}
+    return {'status': 'pending'}
+
+def submit_report(prediction):
+    """Queue a report render unless an up-to-date one exists or is already being rendered"""
+    report_status = get_report_status(prediction)
+    if report_status['status'] in ('ready', 'pending'):
+        return report_status
+    
+    fingerprint = PredictionReportGenerator.report_fingerprint(prediction)
+    ReportRender.objects.update_or_create(
+        fingerprint=fingerprint,
+        defaults={'prediction': prediction, 'status': 'pending', 'error': ''}
+    )
+    # Profiling state is per thread, so a request's X-Profile mode travels with the job
+    profile_mode = requested_mode()
+    transaction.on_commit(
+        lambda: _report_executor.submit(render_report, prediction.pk, fingerprint, profile_mode)
+    )
+    return {'status': 'pending'}
+
+def render_report(prediction_id, fingerprint, profile_mode=None):
+    """Worker entry point: render one prediction report into the cache"""
+    try:
+        prediction = Prediction.objects.select_related('student').prefetch_related(
+            'interventions'
+        ).get(pk=prediction_id)
+        with request_profiling(profile_mode):
+            PredictionReportGenerator.generate_report(prediction)
+        ReportRender.objects.filter(fingerprint=fingerprint).delete()
+    except Exception as e:
+        ReportRender.objects.filter(fingerprint=fingerprint).update(
+            status='failed', error=str(e), updated_at=timezone.now()
+        )
+    finally:
+        connection.close()
+
+def get_render_pool():
+    """Process pool for bulk report rendering; spawned so workers never inherit DB connections"""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'REPORT_PROCESSES', None),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+    return _render_pool
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from students.models import Student
+from predictions.engine import PredictionEngine
+
+class Command(BaseCommand):
+    help = 'Rebuild the stored prediction feature vectors from students, results and factors'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'student_ids', nargs='*',
+            help='Only rebuild these students (defaults to everyone)'
+        )
+        parser.add_argument('--batch-size', type=int, default=PredictionEngine.BATCH_SIZE)
+    
+    def handle(self, *args, **options):
+        student_pks = None
+        if options['student_ids']:
+            student_pks = list(
+                Student.objects.filter(student_id__in=options['student_ids'])
+                .values_list('pk', flat=True)
+            )
+        
+        written = PredictionEngine.refresh_feature_vectors(student_pks, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} feature vectors"))
@@ -0,0 +1,16 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from predictions.jobs import STALE_JOB_AFTER, recover_stale_jobs
+
+class Command(BaseCommand):
+    help = 'Fail prediction jobs left pending or running by a worker pool that stopped; run at startup'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=int(STALE_JOB_AFTER.total_seconds()),
+            help='Seconds without progress before a job counts as stale'
+        )
+    
+    def handle(self, *args, **options):
+        recovered = recover_stale_jobs(timedelta(seconds=options['older_than']))
+        self.stdout.write(self.style.SUCCESS(f"Failed {recovered} stale prediction jobs"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from predictions.engine import PredictionEngine
+
+class Command(BaseCommand):
+    help = 'Re-predict students whose results, factors or admission score changed since the last rescore'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--semester', default='Current')
+        parser.add_argument('--batch-size', type=int, default=PredictionEngine.BATCH_SIZE)
+    
+    def handle(self, *args, **options):
+        outcome = PredictionEngine.rescore_dirty(options['semester'], batch_size=options['batch_size'])
+        at_risk = sum(1 for p in outcome['predictions'] if p.risk_level == 'at_risk')
+        self.stdout.write(self.style.SUCCESS(
+            f"Rescored {len(outcome['predictions'])} students ({at_risk} at risk), "
+            f"skipped {outcome['skipped']} with unchanged inputs"
+        ))
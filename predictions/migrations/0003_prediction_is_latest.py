@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+def mark_latest_predictions(apps, schema_editor):
+    Prediction = apps.get_model('predictions', 'Prediction')
+    Prediction.objects.update(is_latest=False)
+    newest = Prediction.objects.filter(
+        student=models.OuterRef('student'), semester=models.OuterRef('semester')
+    ).order_by('-predicted_at', '-id').values('pk')[:1]
+    Prediction.objects.filter(pk=models.Subquery(newest)).update(is_latest=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0002_predictionjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prediction',
+            name='is_latest',
+            field=models.BooleanField(default=True, help_text='Most recent prediction for this student and semester'),
+        ),
+        migrations.RunPython(mark_latest_predictions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(condition=models.Q(('is_latest', True)), fields=['risk_level', '-predicted_at'], name='latest_prediction_risk_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='prediction',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_latest', True)), fields=('student', 'semester'), name='unique_latest_prediction'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0003_prediction_is_latest'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['-predicted_at', '-id'], name='prediction_cursor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['student', '-predicted_at', '-id'], name='prediction_student_cursor_idx'),
+        ),
+    ]
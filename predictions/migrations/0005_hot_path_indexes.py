@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0004_cursor_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='intervention',
+            index=models.Index(fields=['prediction', 'status', 'priority'], name='intervention_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['risk_level', '-predicted_at'], name='prediction_risk_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('students', '0004_hot_path_indexes'),
+        ('predictions', '0005_hot_path_indexes'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='StudentFeatureVector',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='feature_vector', serialize=False, to='students.student')),
+                ('first_semester_gpa', models.FloatField()),
+                ('attendance_percentage', models.FloatField()),
+                ('assignment_average', models.FloatField()),
+                ('study_hours_per_week', models.FloatField()),
+                ('admission_score', models.FloatField()),
+                ('socioeconomic_status', models.CharField(max_length=20)),
+                ('gpa_feature', models.FloatField()),
+                ('attendance_feature', models.FloatField()),
+                ('assignment_feature', models.FloatField()),
+                ('study_feature', models.FloatField()),
+                ('admission_feature', models.FloatField()),
+                ('socioeconomic_feature', models.FloatField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'student_feature_vectors',
+            },
+        ),
+    ]
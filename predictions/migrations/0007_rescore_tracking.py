@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:07
+
+from django.db import migrations, models
+
+class Migration(migrations.Migration):
+    
+    dependencies = [
+        ('predictions', '0006_studentfeaturevector'),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='predictionjob',
+            name='skipped',
+            field=models.IntegerField(default=0, help_text='Students whose inputs matched their latest prediction'),
+        ),
+        migrations.AddField(
+            model_name='studentfeaturevector',
+            name='needs_rescore',
+            field=models.BooleanField(default=True, help_text='Inputs changed since PredictionEngine.rescore_dirty last ran'),
+        ),
+        migrations.AlterField(
+            model_name='predictionjob',
+            name='filters',
+            field=models.JSONField(default=dict, help_text='department, admission_year and/or student_ids, or dirty_only'),
+        ),
+        migrations.AddIndex(
+            model_name='studentfeaturevector',
+            index=models.Index(condition=models.Q(('needs_rescore', True)), fields=['student'], name='feature_vector_dirty_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0007_rescore_tracking'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='prediction',
+            name='latest_prediction_risk_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='prediction',
+            name='prediction_risk_idx',
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(condition=models.Q(('is_latest', True)), fields=['risk_level', '-predicted_at', '-id'], name='latest_prediction_risk_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0008_hot_path_index_fixes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportRender',
+            fields=[
+                ('fingerprint', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('error', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('prediction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_renders', to='predictions.prediction')),
+            ],
+            options={
+                'db_table': 'report_renders',
+            },
+        ),
+    ]
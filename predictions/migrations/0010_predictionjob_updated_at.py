@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0009_reportrender'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='predictionjob',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, help_text='Last progress; jobs that stop progressing are failed as stale'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0010_predictionjob_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='predictionjob',
+            name='worker',
+            field=models.CharField(blank=True, default='', help_text='Process whose pool queued the job', max_length=100),
+        ),
+    ]
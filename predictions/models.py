@@ -1,6 +1,14 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Q
 from students.models import Student
 
+class PredictionQuerySet(models.QuerySet):
+    
+    def current(self):
+        """Only the latest prediction for each student and semester"""
+        return self.filter(is_latest=True)
+
 class Prediction(models.Model):
     RISK_LEVELS = [
         ('high_achiever', 'High Achiever'),
@@ -25,13 +33,102 @@ class Prediction(models.Model):
     predicted_at = models.DateTimeField(auto_now_add=True)
     semester = models.CharField(max_length=20)
     notes = models.TextField(blank=True)
+    is_latest = models.BooleanField(
+        default=True, help_text="Most recent prediction for this student and semester"
+    )
+    
+    objects = PredictionQuerySet.as_manager()
     
     class Meta:
         db_table = 'predictions'
         ordering = ['-predicted_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['student', 'semester'],
+                condition=Q(is_latest=True),
+                name='unique_latest_prediction'
+            ),
+        ]
+        indexes = [
+            # at_risk, in cursor order
+            models.Index(
+                fields=['risk_level', '-predicted_at', '-id'],
+                condition=Q(is_latest=True),
+                name='latest_prediction_risk_idx'
+            ),
+            # Cursor pagination seeks
+            models.Index(fields=['-predicted_at', '-id'], name='prediction_cursor_idx'),
+            models.Index(fields=['student', '-predicted_at', '-id'], name='prediction_student_cursor_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.student_id} - {self.predicted_cgpa} ({self.risk_level})"
+    
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.is_latest:
+            with transaction.atomic():
+                Prediction.supersede([self.student_id], self.semester)
+                super().save(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+    
+    @classmethod
+    def supersede(cls, student_ids, semester):
+        """Clear is_latest on the current predictions of these students before new ones are written"""
+        cls.objects.filter(
+            student_id__in=student_ids, semester=semester, is_latest=True
+        ).update(is_latest=False)
+    
+    @classmethod
+    def promote_latest(cls, student_id, semester):
+        """Mark the newest remaining prediction for a student and semester as latest"""
+        newest = cls.objects.filter(
+            student_id=student_id, semester=semester
+        ).order_by('-predicted_at', '-id').values_list('pk', flat=True).first()
+        if newest is not None:
+            cls.objects.filter(pk=newest).update(is_latest=True)
+
+class StudentFeatureVector(models.Model):
+    """
+    A student's prediction inputs, normalized to the 0-100 scale PredictionEngine
+    weighs them on, next to the raw values a Prediction snapshots. Kept current
+    by predictions.signals; rebuild with `manage.py rebuild_feature_vectors`.
+    """
+    student = models.OneToOneField(
+        Student, on_delete=models.CASCADE, primary_key=True, related_name='feature_vector'
+    )
+    
+    # Raw inputs, named as on AdditionalFactors so a vector can stand in for them
+    first_semester_gpa = models.FloatField()
+    attendance_percentage = models.FloatField()
+    assignment_average = models.FloatField()
+    study_hours_per_week = models.FloatField()
+    admission_score = models.FloatField()
+    socioeconomic_status = models.CharField(max_length=20)
+    
+    # Normalized features
+    gpa_feature = models.FloatField()
+    attendance_feature = models.FloatField()
+    assignment_feature = models.FloatField()
+    study_feature = models.FloatField()
+    admission_feature = models.FloatField()
+    socioeconomic_feature = models.FloatField()
+    
+    needs_rescore = models.BooleanField(
+        default=True, help_text="Inputs changed since PredictionEngine.rescore_dirty last ran"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'student_feature_vectors'
+        indexes = [
+            models.Index(
+                fields=['student'], condition=Q(needs_rescore=True), name='feature_vector_dirty_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Features for student {self.student_id}"
 
 class Intervention(models.Model):
     INTERVENTION_TYPES = [
@@ -59,6 +156,76 @@ class Intervention(models.Model):
     
     class Meta:
         db_table = 'interventions'
+        indexes = [
+            # Open interventions for a prediction, by priority
+            models.Index(fields=['prediction', 'status', 'priority'], name='intervention_status_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_intervention_type_display()} for {self.prediction.student.student_id}"
+
+class PredictionJob(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    semester = models.CharField(max_length=20)
+    filters = models.JSONField(
+        default=dict, help_text="department, admission_year and/or student_ids, or dirty_only"
+    )
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='prediction_jobs'
+    )
+    
+    # Progress counters
+    total = models.IntegerField(default=0)
+    processed = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    at_risk = models.IntegerField(default=0)
+    skipped = models.IntegerField(default=0, help_text="Students whose inputs matched their latest prediction")
+    errors = models.JSONField(default=list, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(
+        auto_now=True, help_text="Last progress; jobs that stop progressing are failed as stale"
+    )
+    worker = models.CharField(
+        max_length=100, blank=True, default='', help_text="Process whose pool queued the job"
+    )
+    
+    class Meta:
+        db_table = 'prediction_jobs'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Job {self.pk} ({self.status}): {self.processed}/{self.total}"
+
+class ReportRender(models.Model):
+    """
+    A report render queued or failed in the background, keyed by report
+    fingerprint so every worker sees it. The row is deleted once the PDF is
+    written; a ready report is recognised by its file.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('failed', 'Failed'),
+    ]
+    
+    fingerprint = models.CharField(max_length=64, primary_key=True)
+    prediction = models.ForeignKey(Prediction, on_delete=models.CASCADE, related_name='report_renders')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    error = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'report_renders'
+    
+    def __str__(self):
+        return f"Report {self.fingerprint[:16]} ({self.status})"
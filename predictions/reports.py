@@ -1,131 +1,378 @@
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
 from reportlab.lib.units import inch
-from datetime import datetime
+from django.conf import settings
+from core.profiling import profiled, stage
+import functools
+import hashlib
+import io
+import json
 import os
+import threading
+import time
+import zipfile
 
 class PredictionReportGenerator:
     
+    REPORTS_DIR = os.path.join('media', 'reports')
+    
+    # Cache eviction: oldest reports are removed once either limit is exceeded
+    CACHE_MAX_BYTES = getattr(settings, 'REPORT_CACHE_MAX_BYTES', 500 * 1024 * 1024)
+    CACHE_MAX_AGE_DAYS = getattr(settings, 'REPORT_CACHE_MAX_AGE_DAYS', 30)
+    # Renders trigger an eviction scan at most this often per process
+    EVICTION_INTERVAL_SECONDS = getattr(settings, 'REPORT_CACHE_EVICTION_INTERVAL', 300)
+    
+    _last_eviction = 0.0
+    _eviction_lock = threading.Lock()
+    
+    @classmethod
+    def report_context(cls, prediction):
+        """
+        Plain-data snapshot of everything a prediction's report shows, so
+        reports can be hashed and rendered without touching the database
+        """
+        student = prediction.student
+        return {
+            'id': prediction.pk,
+            'student_id': student.student_id,
+            'name': f"{student.first_name} {student.last_name}",
+            'department': student.department,
+            'email': student.email,
+            'predicted_cgpa': prediction.predicted_cgpa,
+            'risk_level': prediction.risk_level,
+            'risk_level_display': prediction.get_risk_level_display(),
+            'confidence_score': prediction.confidence_score,
+            'predicted_at': prediction.predicted_at.strftime('%Y-%m-%d %H:%M'),
+            'first_semester_gpa': prediction.first_semester_gpa,
+            'attendance_percentage': prediction.attendance_percentage,
+            'assignment_average': prediction.assignment_average,
+            'study_hours': prediction.study_hours,
+            'admission_score': prediction.admission_score,
+            'socioeconomic_score': prediction.socioeconomic_score,
+            'weight_labels': cls.weight_labels(),
+            'interventions': [
+                {
+                    'type_display': intervention.get_intervention_type_display(),
+                    'priority': intervention.priority,
+                    'description': intervention.description,
+                }
+                for intervention in prediction.interventions.all()
+            ],
+        }
+    
     @staticmethod
-    def generate_report(prediction):
-        """Generate PDF report for a prediction"""
+    @functools.lru_cache(maxsize=None)
+    def weight_labels():
+        """PredictionEngine.WEIGHTS formatted as percentages, e.g. {'attendance': '15%'}"""
+        # Imported here so render worker processes can load this module without Django apps
+        from .engine import PredictionEngine
+        return {factor: f"{weight:.0%}" for factor, weight in PredictionEngine.WEIGHTS.items()}
+    
+    @classmethod
+    def report_fingerprint(cls, prediction, context=None):
+        """Hash of everything that appears in a prediction's report"""
+        context = context or cls.report_context(prediction)
+        return hashlib.sha256(json.dumps(context, sort_keys=True).encode()).hexdigest()
+    
+    @classmethod
+    def report_path(cls, prediction, fingerprint=None):
+        fingerprint = fingerprint or cls.report_fingerprint(prediction)
+        filename = f"prediction_report_{prediction.student.student_id}_{fingerprint[:16]}.pdf"
+        return os.path.join(cls.REPORTS_DIR, filename)
+    
+    @classmethod
+    def get_cached_report(cls, prediction, fingerprint=None):
+        """Path of an up-to-date report for this prediction, or None"""
+        filepath = cls.report_path(prediction, fingerprint)
+        if not os.path.exists(filepath):
+            return None
+        os.utime(filepath)  # mark as recently used for eviction
+        return filepath
+    
+    @classmethod
+    def evict_reports(cls, max_bytes=None, max_age_days=None):
+        """Remove reports older than max_age_days, then the least recently used over max_bytes"""
+        max_bytes = cls.CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        max_age_days = cls.CACHE_MAX_AGE_DAYS if max_age_days is None else max_age_days
+        if not os.path.isdir(cls.REPORTS_DIR):
+            return 0
         
-        filename = f"prediction_report_{prediction.student.student_id}_{datetime.now().strftime('%Y%m%d')}.pdf"
-        filepath = os.path.join('media', 'reports', filename)
+        reports = []
+        for entry in os.scandir(cls.REPORTS_DIR):
+            if entry.is_file() and entry.name.endswith('.pdf'):
+                stat = entry.stat()
+                reports.append((stat.st_mtime, stat.st_size, entry.path))
+        reports.sort(reverse=True)
+        
+        cutoff = time.time() - max_age_days * 86400
+        total_bytes = 0
+        removed = 0
+        for mtime, size, path in reports:
+            total_bytes += size
+            if mtime < cutoff or total_bytes > max_bytes:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+    
+    @classmethod
+    def evict_reports_if_due(cls):
+        """evict_reports, unless this process already ran it in the last EVICTION_INTERVAL_SECONDS"""
+        with cls._eviction_lock:
+            now = time.monotonic()
+            if cls._last_eviction and now - cls._last_eviction < cls.EVICTION_INTERVAL_SECONDS:
+                return 0
+            cls._last_eviction = now
+        return cls.evict_reports()
+    
+    @classmethod
+    @profiled('generate_report')
+    def generate_report(cls, prediction):
+        """Generate PDF report for a prediction, reusing the cached file if it is unchanged"""
+        
+        with stage('fetch'):
+            context = cls.report_context(prediction)
+            fingerprint = cls.report_fingerprint(prediction, context)
+            cached = cls.get_cached_report(prediction, fingerprint)
+        if cached:
+            return cached
+        
+        filepath = cls.report_path(prediction, fingerprint)
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
         
-        doc = SimpleDocTemplate(filepath, pagesize=A4)
-        styles = getSampleStyleSheet()
+        # Render to a temporary name so readers never see a half-written file
+        tmp_path = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+        doc = SimpleDocTemplate(tmp_path, pagesize=A4)
+        
+        try:
+            with stage('render'):
+                story = cls.build_story(context)
+                doc.build(story)
+            with stage('persist'):
+                os.replace(tmp_path, filepath)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        
+        with stage('persist'):
+            cls.evict_reports_if_due()
+        return filepath
+    
+    @classmethod
+    @profiled('generate_report_bytes')
+    def generate_report_bytes(cls, prediction):
+        """
+        PDF bytes for a prediction: read from the report cache when an
+        up-to-date file exists, otherwise rendered in memory without writing to disk
+        """
+        with stage('fetch'):
+            context = cls.report_context(prediction)
+            cached = cls.get_cached_report(prediction, cls.report_fingerprint(prediction, context))
+            if cached:
+                with open(cached, 'rb') as f:
+                    return f.read()
+        with stage('render'):
+            return render_report_bytes(context)[1]
+    
+    @classmethod
+    def build_story(cls, context, styles=None):
+        """Flowables for one prediction's report, built from report_context()"""
+        styles = styles or get_report_styles()
         story = []
         
         # Title
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#1a365d'),
-            spaceAfter=30,
-            alignment=1
-        )
-        title = Paragraph("Student Performance Prediction Report", title_style)
-        story.append(title)
+        story.append(Paragraph("Student Performance Prediction Report", styles['title']))
         story.append(Spacer(1, 0.3*inch))
         
         # Student Information
         student_data = [
-            ['Student ID:', prediction.student.student_id],
-            ['Name:', f"{prediction.student.first_name} {prediction.student.last_name}"],
-            ['Department:', prediction.student.department],
-            ['Email:', prediction.student.email],
+            ['Student ID:', context['student_id']],
+            ['Name:', context['name']],
+            ['Department:', context['department']],
+            ['Email:', context['email']],
         ]
         
         student_table = Table(student_data, colWidths=[2*inch, 4*inch])
-        student_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e2e8f0')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#cbd5e0'))
-        ]))
+        student_table.setStyle(styles['student_table'])
         story.append(student_table)
         story.append(Spacer(1, 0.4*inch))
         
         # Prediction Results
-        story.append(Paragraph("Prediction Results", styles['Heading2']))
+        story.append(Paragraph("Prediction Results", styles['sheet']['Heading2']))
         story.append(Spacer(1, 0.2*inch))
         
-        risk_color = {
-            'high_achiever': colors.green,
-            'average': colors.orange,
-            'at_risk': colors.red
-        }
-        
         prediction_data = [
-            ['Predicted CGPA:', str(prediction.predicted_cgpa)],
-            ['Risk Level:', prediction.get_risk_level_display()],
-            ['Confidence Score:', f"{prediction.confidence_score}%"],
-            ['Prediction Date:', prediction.predicted_at.strftime('%Y-%m-%d %H:%M')],
+            ['Predicted CGPA:', str(context['predicted_cgpa'])],
+            ['Risk Level:', context['risk_level_display']],
+            ['Confidence Score:', f"{context['confidence_score']}%"],
+            ['Prediction Date:', context['predicted_at']],
         ]
         
         prediction_table = Table(prediction_data, colWidths=[2*inch, 4*inch])
-        prediction_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e2e8f0')),
-            ('TEXTCOLOR', (1, 1), (1, 1), risk_color.get(prediction.risk_level, colors.black)),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (1, 1), (1, 1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#cbd5e0'))
-        ]))
+        prediction_table.setStyle(
+            styles['prediction_tables'].get(context['risk_level'], styles['prediction_tables'][None])
+        )
         story.append(prediction_table)
         story.append(Spacer(1, 0.4*inch))
         
         # Input Factors
-        story.append(Paragraph("Input Factors Used", styles['Heading2']))
+        story.append(Paragraph("Input Factors Used", styles['sheet']['Heading2']))
         story.append(Spacer(1, 0.2*inch))
         
+        weights = context['weight_labels']
         factors_data = [
             ['Factor', 'Value', 'Weight'],
-            ['First Semester GPA', f"{prediction.first_semester_gpa:.2f}", '40%'],
-            ['Attendance', f"{prediction.attendance_percentage:.1f}%", '15%'],
-            ['Assignment Average', f"{prediction.assignment_average:.1f}%", '15%'],
-            ['Study Hours/Week', f"{prediction.study_hours:.1f}", '10%'],
-            ['Admission Score', f"{prediction.admission_score:.0f}", '10%'],
-            ['Socioeconomic Score', f"{prediction.socioeconomic_score:.0f}", '10%'],
+            ['First Semester GPA', f"{context['first_semester_gpa']:.2f}", weights['first_semester_gpa']],
+            ['Attendance', f"{context['attendance_percentage']:.1f}%", weights['attendance']],
+            ['Assignment Average', f"{context['assignment_average']:.1f}%", weights['assignments']],
+            ['Study Hours/Week', f"{context['study_hours']:.1f}", weights['study_hours']],
+            ['Admission Score', f"{context['admission_score']:.0f}", weights['admission_score']],
+            ['Socioeconomic Score', f"{context['socioeconomic_score']:.0f}", weights['socioeconomic']],
         ]
         
         factors_table = Table(factors_data, colWidths=[2.5*inch, 2*inch, 1.5*inch])
-        factors_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2d3748')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
+        factors_table.setStyle(styles['factors_table'])
         story.append(factors_table)
         
         # Interventions (if any)
-        interventions = prediction.interventions.all()
+        interventions = context['interventions']
         if interventions:
             story.append(Spacer(1, 0.4*inch))
-            story.append(Paragraph("Recommended Interventions", styles['Heading2']))
+            story.append(Paragraph("Recommended Interventions", styles['sheet']['Heading2']))
             story.append(Spacer(1, 0.2*inch))
             
             for intervention in interventions:
                 story.append(Paragraph(
-                    f"<b>{intervention.get_intervention_type_display()}</b> (Priority: {intervention.priority})",
-                    styles['Normal']
+                    f"<b>{intervention['type_display']}</b> (Priority: {intervention['priority']})",
+                    styles['sheet']['Normal']
                 ))
-                story.append(Paragraph(intervention.description, styles['Normal']))
+                story.append(Paragraph(intervention['description'], styles['sheet']['Normal']))
                 story.append(Spacer(1, 0.15*inch))
         
+        return story
+    
+    @classmethod
+    def render_cohort_pdf(cls, contexts, target):
+        """Render many reports into one multi-page PDF sharing a document and stylesheet"""
+        doc = SimpleDocTemplate(target, pagesize=A4)
+        story = []
+        for context in contexts:
+            if story:
+                story.append(PageBreak())
+            story.extend(cls.build_story(context))
         doc.build(story)
-        return filepath
+    
+    @staticmethod
+    def cohort_filename(context):
+        return f"prediction_report_{context['student_id']}_{context['id']}.pdf"
+    
+    @classmethod
+    def stream_cohort_zip(cls, contexts, map_func=map):
+        """
+        Yield a ZIP of individual reports chunk by chunk. `map_func` runs
+        render_report_bytes over the contexts, e.g. a process pool's map.
+        """
+        stream = _ChunkStream()
+        with zipfile.ZipFile(stream, 'w', zipfile.ZIP_STORED) as archive:
+            for filename, data in map_func(render_report_bytes, contexts):
+                archive.writestr(filename, data)
+                yield stream.pop()
+        yield stream.pop()
+
+class _ChunkStream(io.RawIOBase):
+    """Unseekable write-only buffer that hands back whatever was written since the last pop"""
+    
+    def __init__(self):
+        self._chunks = []
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def render_report_bytes(context):
+    """Render a single report to PDF bytes; module-level so process pools can pickle it"""
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    doc.build(PredictionReportGenerator.build_story(context))
+    return PredictionReportGenerator.cohort_filename(context), buffer.getvalue()
+
+def render_cohort_pdf_bytes(contexts):
+    """Render a multi-page cohort PDF to bytes; module-level so process pools can pickle it"""
+    buffer = io.BytesIO()
+    PredictionReportGenerator.render_cohort_pdf(contexts, buffer)
+    return buffer.getvalue()
+
+_report_styles = None
+
+def get_report_styles():
+    """
+    Stylesheet, paragraph and table styles shared by every report.
+    Built on first use; ReportLab styles are read-only once built.
+    """
+    global _report_styles
+    if _report_styles is not None:
+        return _report_styles
+    
+    sheet = getSampleStyleSheet()
+    
+    label_table = [
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e2e8f0')),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#cbd5e0'))
+    ]
+    
+    # The risk level cell is coloured, so there is one prediction table style per level
+    prediction_tables = {
+        risk_level: TableStyle(label_table + [
+            ('TEXTCOLOR', (1, 1), (1, 1), color),
+            ('FONTNAME', (1, 1), (1, 1), 'Helvetica-Bold'),
+        ])
+        for risk_level, color in [
+            ('high_achiever', colors.green),
+            ('average', colors.orange),
+            ('at_risk', colors.red),
+            (None, colors.black),
+        ]
+    }
+    
+    _report_styles = {
+        'sheet': sheet,
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=sheet['Heading1'],
+            fontSize=24,
+            textColor=colors.HexColor('#1a365d'),
+            spaceAfter=30,
+            alignment=1
+        ),
+        'student_table': TableStyle(label_table + [
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ]),
+        'prediction_tables': prediction_tables,
+        'factors_table': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2d3748')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 11),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]),
+    }
+    return _report_styles
@@ -1,6 +1,6 @@
 from rest_framework import serializers
-from .models import Prediction, Intervention
-from students.serializers import StudentSerializer
+from .models import Prediction, Intervention, PredictionJob
+from students.serializers import StudentSerializer, StudentSummarySerializer
 
 class InterventionSerializer(serializers.ModelSerializer):
     intervention_type_display = serializers.CharField(source='get_intervention_type_display', read_only=True)
@@ -18,6 +18,49 @@ class PredictionSerializer(serializers.ModelSerializer):
         model = Prediction
         fields = '__all__'
 
+class PredictionWithStudentSerializer(PredictionSerializer):
+    """Prediction detail with the student but not their full results"""
+    student_details = StudentSummarySerializer(source='student', read_only=True)
+
+class PredictionListSerializer(serializers.ModelSerializer):
+    """Compact representation used by list endpoints unless ?expand= is given"""
+    student_id = serializers.CharField(source='student.student_id', read_only=True)
+    student_name = serializers.SerializerMethodField()
+    risk_level_display = serializers.CharField(source='get_risk_level_display', read_only=True)
+    
+    class Meta:
+        model = Prediction
+        fields = [
+            'id', 'student', 'student_id', 'student_name', 'predicted_cgpa',
+            'risk_level', 'risk_level_display', 'semester', 'predicted_at'
+        ]
+    
+    def get_student_name(self, obj):
+        return f"{obj.student.first_name} {obj.student.last_name}"
+
 class PredictionRequestSerializer(serializers.Serializer):
     student_id = serializers.CharField()
     semester = serializers.CharField(default='Current')
+
+class BulkPredictionRequestSerializer(serializers.Serializer):
+    department = serializers.CharField(required=False)
+    admission_year = serializers.IntegerField(required=False)
+    student_ids = serializers.ListField(child=serializers.CharField(), required=False, allow_empty=False)
+    semester = serializers.CharField(default='Current')
+    
+    def validate(self, data):
+        if not any(key in data for key in ('department', 'admission_year', 'student_ids')):
+            raise serializers.ValidationError(
+                'Provide at least one of department, admission_year or student_ids'
+            )
+        return data
+
+class RescoreRequestSerializer(serializers.Serializer):
+    semester = serializers.CharField(default='Current')
+
+class PredictionJobSerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    
+    class Meta:
+        model = PredictionJob
+        fields = '__all__'
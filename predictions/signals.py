@@ -0,0 +1,32 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from students.models import Student, AdditionalFactors
+from students.signals import semester_summaries_changed
+from .engine import PredictionEngine
+from .models import Prediction, StudentFeatureVector
+
+@receiver(post_delete, sender=Prediction)
+def promote_previous_prediction(sender, instance, **kwargs):
+    """When the latest prediction is deleted, the one before it becomes current"""
+    if instance.is_latest:
+        Prediction.promote_latest(instance.student_id, instance.semester)
+
+@receiver(semester_summaries_changed)
+def refresh_vectors_for_results(sender, student_ids, **kwargs):
+    """Result changes move the first-semester GPA feature"""
+    PredictionEngine.refresh_feature_vectors(student_ids)
+
+@receiver(post_save, sender=AdditionalFactors)
+def refresh_vector_for_factors(sender, instance, **kwargs):
+    PredictionEngine.refresh_feature_vectors([instance.student_id])
+
+@receiver(post_delete, sender=AdditionalFactors)
+def remove_vector_for_factors(sender, instance, **kwargs):
+    StudentFeatureVector.objects.filter(student_id=instance.student_id).delete()
+
+@receiver(post_save, sender=Student)
+def refresh_vector_for_student(sender, instance, created, update_fields=None, **kwargs):
+    """The admission score is a feature; a new student has no factors yet"""
+    if created or (update_fields is not None and 'admission_score' not in update_fields):
+        return
+    PredictionEngine.refresh_feature_vectors([instance.pk])
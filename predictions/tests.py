@@ -0,0 +1,312 @@
+import io
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from core.profiling import list_profiles
+from core.tests import QueryPlanTestCase, seed
+from students.models import Student, AdditionalFactors
+from .engine import PredictionEngine
+from .jobs import (
+    WORKER_ID, get_job_students, get_report_status, recover_stale_jobs, render_report, run_prediction_job,
+    submit_report
+)
+from .models import Prediction, PredictionJob, ReportRender, StudentFeatureVector
+from .reports import PredictionReportGenerator
+
+class CohortPredictionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed(students=40, no_predictions=True)
+    
+    def outcomes(self, semester):
+        return {
+            prediction.student_id: (
+                prediction.predicted_cgpa, prediction.risk_level, prediction.confidence_score,
+                [
+                    (i.intervention_type, i.description, i.priority, i.status)
+                    for i in sorted(prediction.interventions.all(), key=lambda i: i.pk)
+                ]
+            )
+            for prediction in Prediction.objects.filter(semester=semester).prefetch_related('interventions')
+        }
+    
+    def test_cohort_matches_one_by_one(self):
+        students = Student.objects.filter(factors__isnull=False).order_by('pk')
+        for student in students:
+            PredictionEngine.predict_cgpa(student.student_id, 'Single')
+        outcome = PredictionEngine.predict_cohort(students, 'Cohort', batch_size=7)
+        
+        single, cohort = self.outcomes('Single'), self.outcomes('Cohort')
+        self.assertEqual(outcome['errors'], [])
+        self.assertEqual(len(cohort), students.count())
+        for student_id, expected in single.items():
+            self.assertEqual(cohort[student_id], expected, student_id)
+        # The comparison covers every risk level and some interventions
+        self.assertEqual({risk for _, risk, _, _ in cohort.values()}, {'at_risk', 'average', 'high_achiever'})
+        self.assertTrue(any(interventions for *_, interventions in cohort.values()))
+
+class RescoreDirtyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed(students=20, no_predictions=True)
+        for semester in ('First', 'Second'):
+            PredictionEngine.predict_cohort(Student.objects.all(), semester)
+        PredictionEngine.rescore_dirty('First')
+    
+    def make_dirty(self):
+        factors = AdditionalFactors.objects.order_by('pk').first()
+        factors.attendance_percentage = 12.5
+        factors.save()
+        return factors.student_id
+    
+    def test_clean_students_are_not_rescored(self):
+        self.assertFalse(StudentFeatureVector.objects.filter(needs_rescore=True).exists())
+        outcome = PredictionEngine.rescore_dirty('First')
+        self.assertEqual((outcome['predictions'], outcome['skipped']), ([], 0))
+    
+    def test_the_flag_clears_once_the_semester_is_rescored(self):
+        student_id = self.make_dirty()
+        
+        outcome = PredictionEngine.rescore_dirty('First')
+        
+        self.assertEqual([p.student_id for p in outcome['predictions']], [student_id])
+        prediction = Prediction.objects.current().get(student_id=student_id, semester='First')
+        self.assertEqual(prediction.attendance_percentage, 12.5)
+        # Older semesters keep their prediction and do not hold the student dirty
+        self.assertFalse(StudentFeatureVector.objects.filter(needs_rescore=True).exists())
+        self.assertEqual(PredictionEngine.rescore_dirty('First')['predictions'], [])
+    
+    def test_an_up_to_date_student_is_skipped_and_cleared(self):
+        student_id = self.make_dirty()
+        PredictionEngine.predict_cohort(Student.objects.filter(pk=student_id), 'First')
+        
+        outcome = PredictionEngine.rescore_dirty('First')
+        
+        self.assertEqual((outcome['predictions'], outcome['skipped']), ([], 1))
+        self.assertFalse(StudentFeatureVector.objects.get(pk=student_id).needs_rescore)
+
+class QueryPlanTests(QueryPlanTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed(students=60)
+        cls.student_id = Student.objects.order_by('pk').values_list('student_id', flat=True).first()
+    
+    def test_prediction_list(self):
+        self.assertIndexedQueries('/api/predictions/predictions/')
+    
+    def test_prediction_list_by_risk_level(self):
+        self.assertIndexedQueries('/api/predictions/predictions/?risk_level=at_risk')
+    
+    def test_prediction_list_by_student(self):
+        self.assertIndexedQueries(f'/api/predictions/predictions/?student_id={self.student_id}')
+    
+    def test_at_risk(self):
+        self.assertIndexedQueries('/api/predictions/predictions/at_risk/')
+    
+    def test_expanded_list(self):
+        self.assertIndexedQueries('/api/predictions/predictions/?expand=student')
+
+class ReportStatusTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed(students=5)
+        cls.prediction = Prediction.objects.current().select_related('student').order_by('pk').first()
+    
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(PredictionReportGenerator, 'REPORTS_DIR', directory.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def render(self):
+        """Run the queued render in this thread; the worker's connection.close() would end the test transaction"""
+        fingerprint = PredictionReportGenerator.report_fingerprint(self.prediction)
+        with mock.patch('predictions.jobs.connection'):
+            render_report(self.prediction.pk, fingerprint)
+    
+    def test_status_is_shared_through_the_database(self):
+        self.assertEqual(get_report_status(self.prediction), {'status': 'missing'})
+        
+        with self.captureOnCommitCallbacks() as queued:
+            self.assertEqual(submit_report(self.prediction), {'status': 'pending'})
+        self.assertEqual(len(queued), 1)
+        self.assertEqual(ReportRender.objects.get().status, 'pending')
+        self.assertEqual(get_report_status(self.prediction), {'status': 'pending'})
+        
+        self.render()
+        self.assertEqual(get_report_status(self.prediction)['status'], 'ready')
+        self.assertFalse(ReportRender.objects.exists())
+    
+    def test_failures_are_kept_until_resubmitted(self):
+        with self.captureOnCommitCallbacks():
+            submit_report(self.prediction)
+        with mock.patch.object(PredictionReportGenerator, 'generate_report', side_effect=OSError('disk full')):
+            self.render()
+        
+        self.assertEqual(get_report_status(self.prediction), {'status': 'failed', 'error': 'disk full'})
+        with self.captureOnCommitCallbacks():
+            self.assertEqual(submit_report(self.prediction), {'status': 'pending'})
+    
+    def test_abandoned_render_can_be_queued_again(self):
+        with self.captureOnCommitCallbacks():
+            submit_report(self.prediction)
+        ReportRender.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        
+        self.assertEqual(get_report_status(self.prediction), {'status': 'missing'})
+        with self.captureOnCommitCallbacks() as queued:
+            self.assertEqual(submit_report(self.prediction), {'status': 'pending'})
+        self.assertEqual(len(queued), 1)
+    
+    def test_eviction_scan_is_throttled(self):
+        with mock.patch.object(PredictionReportGenerator, 'evict_reports', return_value=0) as evict, \
+                mock.patch.object(PredictionReportGenerator, '_last_eviction', 0.0):
+            self.render()
+            PredictionReportGenerator.evict_reports_if_due()
+        self.assertEqual(evict.call_count, 1)
+
+class PredictionJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed(students=5)
+        cls.student_ids = list(Student.objects.order_by('pk').values_list('student_id', flat=True))
+    
+    def run_job(self, job):
+        """Run in this thread; the worker's connection.close() would end the test transaction"""
+        with mock.patch('predictions.jobs.connection'):
+            run_prediction_job(job.pk)
+        job.refresh_from_db()
+        return job
+    
+    def test_duplicate_student_ids_are_counted_once(self):
+        ids = [self.student_ids[0], self.student_ids[1], self.student_ids[0]]
+        self.assertEqual(get_job_students({'student_ids': ids}), self.student_ids[:2])
+        
+        job = self.run_job(PredictionJob.objects.create(semester='Jobs', filters={'student_ids': ids}))
+        
+        self.assertEqual((job.status, job.total, job.processed), ('completed', 2, 2))
+    
+    def test_stale_jobs_are_failed(self):
+        stale = PredictionJob.objects.create(semester='Jobs', status='running', filters={'department': 'x'})
+        fresh = PredictionJob.objects.create(semester='Jobs', status='running', filters={'department': 'x'})
+        orphaned = PredictionJob.objects.create(semester='Jobs', worker='gone:1:dead', filters={'department': 'x'})
+        unqueued = PredictionJob.objects.create(semester='Jobs', filters={'department': 'x'})
+        PredictionJob.objects.filter(pk__in=[stale.pk, orphaned.pk, unqueued.pk]).update(
+            updated_at=timezone.now() - timedelta(days=1)
+        )
+        
+        self.assertEqual(recover_stale_jobs(), 2)
+        
+        for job in (stale, orphaned):
+            job.refresh_from_db()
+            self.assertEqual(job.status, 'failed')
+            self.assertIn('Job interrupted', job.errors[-1])
+        for job in (fresh, unqueued):
+            status = job.status
+            job.refresh_from_db()
+            self.assertEqual(job.status, status)
+    
+    def test_a_job_queued_behind_long_runs_is_not_failed(self):
+        waiting = PredictionJob.objects.create(semester='Jobs', worker=WORKER_ID, filters={'department': 'x'})
+        PredictionJob.objects.filter(pk=waiting.pk).update(updated_at=timezone.now() - timedelta(days=1))
+        
+        # The pool is busy with another job; its progress keeps the queued one alive
+        self.run_job(PredictionJob.objects.create(semester='Jobs', filters={'student_ids': self.student_ids}))
+        
+        self.assertEqual(recover_stale_jobs(), 0)
+        self.assertEqual(self.run_job(waiting).status, 'completed')
+    
+    def test_a_failed_job_is_not_run(self):
+        job = PredictionJob.objects.create(semester='Jobs', status='failed', filters={'department': 'x'})
+        self.assertEqual(self.run_job(job).started_at, None)
+
+class BulkReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed(students=4)
+        # A second run supersedes every student's first prediction
+        PredictionEngine.predict_cohort(Student.objects.all(), 'Current')
+    
+    def setUp(self):
+        pool = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(pool.shutdown)
+        patcher = mock.patch('predictions.views.get_render_pool', return_value=pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model()(username='advisor', is_staff=True))
+    
+    def zip_names(self, query):
+        response = self.client.get(f'/api/predictions/predictions/bulk_report/?output=zip{query}')
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as archive:
+            return archive.namelist()
+    
+    def test_only_current_predictions_are_exported(self):
+        current = Prediction.objects.current().count()
+        self.assertEqual(len(self.zip_names('')), current)
+        self.assertEqual(len(self.zip_names('&history=1')), Prediction.objects.count())
+        self.assertGreater(Prediction.objects.count(), current)
+    
+    def test_pdf_is_rendered_in_the_pool_up_to_its_limit(self):
+        response = self.client.get('/api/predictions/predictions/bulk_report/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        
+        with mock.patch('predictions.views.PredictionViewSet.BULK_PDF_LIMIT', 1):
+            response = self.client.get('/api/predictions/predictions/bulk_report/')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('output=zip', response.data['error'])
+
+class ReportProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed(students=3)
+        cls.prediction = Prediction.objects.current().order_by('pk').first()
+    
+    def setUp(self):
+        for name in ('reports', 'profiles'):
+            directory = tempfile.TemporaryDirectory()
+            self.addCleanup(directory.cleanup)
+            setattr(self, f'{name}_dir', directory.name)
+        patcher = mock.patch.object(PredictionReportGenerator, 'REPORTS_DIR', self.reports_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.enterContext(override_settings(PROFILING_ALLOW_HEADER=True, PROFILING_DIR=self.profiles_dir))
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model()(username='profiler', is_staff=True))
+    
+    def test_download_is_profiled(self):
+        response = self.client.get(
+            f'/api/predictions/predictions/{self.prediction.pk}/report/download/', HTTP_X_PROFILE='1'
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        [profile] = list_profiles()
+        self.assertEqual(response['X-Profile-Ids'], profile['id'])
+        self.assertEqual(profile['name'], 'generate_report_bytes')
+        self.assertEqual(set(profile['stages']), {'fetch', 'render'})
+    
+    def test_queued_render_keeps_the_request_profiling_mode(self):
+        with mock.patch('predictions.jobs._report_executor') as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    f'/api/predictions/predictions/{self.prediction.pk}/report/', HTTP_X_PROFILE='cprofile'
+                )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(list_profiles(), [])
+        
+        [(render, *args)] = [call.args for call in executor.submit.call_args_list]
+        self.assertEqual(args[-1], 'cprofile')
+        with mock.patch('predictions.jobs.connection'):
+            render(*args)
+        
+        [profile] = list_profiles()
+        self.assertEqual(profile['name'], 'generate_report')
+        self.assertIsNotNone(profile['cprofile'])
@@ -5,8 +5,11 @@ from . import views
 router = DefaultRouter()
 router.register(r'predictions', views.PredictionViewSet)
 router.register(r'interventions', views.InterventionViewSet)
+router.register(r'jobs', views.PredictionJobViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
     path('predictions/<int:pk>/report/', views.generate_report, name='generate_report'),
+    path('predictions/<int:pk>/report/status/', views.report_status, name='report_status'),
+    path('predictions/<int:pk>/report/download/', views.download_report, name='download_report'),
 ]
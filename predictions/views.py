@@ -1,28 +1,77 @@
+from django.db.models import Prefetch
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import Prediction, Intervention
+from core.pagination import PredictionCursorPagination
+from students.models import Student
+from .models import Prediction, Intervention, PredictionJob
 from .serializers import (
-    PredictionSerializer, InterventionSerializer, PredictionRequestSerializer
+    PredictionSerializer, PredictionWithStudentSerializer, PredictionListSerializer,
+    InterventionSerializer, PredictionRequestSerializer,
+    BulkPredictionRequestSerializer, RescoreRequestSerializer, PredictionJobSerializer
 )
 from .engine import PredictionEngine
-from .reports import PredictionReportGenerator
+from .jobs import submit_prediction_job, submit_report, get_report_status, get_render_pool
+from .reports import PredictionReportGenerator, render_cohort_pdf_bytes
 
 class PredictionViewSet(viewsets.ModelViewSet):
     queryset = Prediction.objects.all()
     serializer_class = PredictionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PredictionCursorPagination
+    
+    # Most predictions a single bulk_report request will render
+    BULK_REPORT_LIMIT = 5000
+    
+    # One document is built by a single pool process while the request waits, so ?output=pdf
+    # stays small; larger cohorts stream as a ZIP rendered across the whole pool
+    BULK_PDF_LIMIT = 500
+    
+    # Actions that list predictions: compact unless ?expand=student[,results]
+    LIST_ACTIONS = ['list', 'at_risk', 'latest']
+    
+    def get_expand(self):
+        return {field for field in self.request.query_params.get('expand', '').split(',') if field}
+    
+    def get_serializer_class(self):
+        if self.action in self.LIST_ACTIONS:
+            expand = self.get_expand()
+            if 'results' in expand:
+                return PredictionSerializer
+            if 'student' in expand:
+                return PredictionWithStudentSerializer
+            return PredictionListSerializer
+        return super().get_serializer_class()
+    
+    def prefetch_for_serializer(self, queryset):
+        """Load everything the chosen serializer reads, so serializing is query-free"""
+        serializer_class = self.get_serializer_class()
+        if serializer_class is PredictionListSerializer:
+            return queryset.select_related('student')
+        # Prefetched rows are matched up by pk, so sorting them is wasted work
+        students = Student.objects.with_details(results=serializer_class is PredictionSerializer).order_by()
+        return queryset.prefetch_related(Prefetch('student', queryset=students), 'interventions')
     
     def get_queryset(self):
         queryset = super().get_queryset()
         student_id = self.request.query_params.get('student_id')
         risk_level = self.request.query_params.get('risk_level')
+        department = self.request.query_params.get('department')
+        semester = self.request.query_params.get('semester')
         
         if student_id:
             queryset = queryset.filter(student__student_id=student_id)
         if risk_level:
             queryset = queryset.filter(risk_level=risk_level)
+        if department:
+            queryset = queryset.filter(student__department=department)
+        if semester:
+            queryset = queryset.filter(semester=semester)
+        
+        if self.action in self.LIST_ACTIONS + ['retrieve']:
+            queryset = self.prefetch_for_serializer(queryset)
         
         return queryset
     
@@ -44,36 +93,172 @@ class PredictionViewSet(viewsets.ModelViewSet):
                 return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['post'])
+    def generate_bulk(self, request):
+        """Queue predictions for a department, admission year or list of students"""
+        serializer = BulkPredictionRequestSerializer(data=request.data)
+        if serializer.is_valid():
+            data = dict(serializer.validated_data)
+            semester = data.pop('semester')
+            job = PredictionJob.objects.create(
+                semester=semester,
+                filters=data,
+                requested_by=request.user
+            )
+            submit_prediction_job(job)
+            return Response(
+                PredictionJobSerializer(job).data,
+                status=status.HTTP_202_ACCEPTED
+            )
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=False, methods=['post'])
+    def rescore_dirty(self, request):
+        """Queue re-predictions for students whose inputs changed since the last rescore"""
+        serializer = RescoreRequestSerializer(data=request.data)
+        if serializer.is_valid():
+            job = PredictionJob.objects.create(
+                semester=serializer.validated_data['semester'],
+                filters={'dirty_only': True},
+                requested_by=request.user
+            )
+            submit_prediction_job(job)
+            return Response(
+                PredictionJobSerializer(job).data,
+                status=status.HTTP_202_ACCEPTED
+            )
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
     @action(detail=False, methods=['get'])
     def statistics(self, request):
-        """Get prediction statistics"""
-        stats = PredictionEngine.get_prediction_statistics()
+        """
+        Get statistics over current predictions, optionally ?group_by=semester,student__department,...
+        Pass ?history=1 to include superseded predictions
+        """
+        group_by = [field for field in request.query_params.get('group_by', '').split(',') if field]
+        predictions = Prediction.objects.all() if request.query_params.get('history') else None
+        try:
+            stats = PredictionEngine.get_prediction_statistics(group_by=group_by, predictions=predictions)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         return Response(stats)
     
+    @action(detail=False, methods=['get'])
+    def bulk_report(self, request):
+        """
+        Download reports for every current prediction matching the list filters,
+        as one multi-page PDF (?output=pdf, default) or a ZIP (?output=zip).
+        Pass ?history=1 to include superseded predictions
+        """
+        output = request.query_params.get('output', 'pdf')
+        if output not in ('pdf', 'zip'):
+            return Response({'error': 'output must be pdf or zip'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        predictions = self.get_queryset()
+        if not request.query_params.get('history'):
+            predictions = predictions.current()
+        predictions = predictions.select_related('student').prefetch_related('interventions')
+        total = predictions.count()
+        if total == 0:
+            return Response({'error': 'No predictions match the given filters'}, status=status.HTTP_404_NOT_FOUND)
+        limit = self.BULK_REPORT_LIMIT if output == 'zip' else self.BULK_PDF_LIMIT
+        if total > limit:
+            hint = '' if output == 'zip' else ' or use ?output=zip'
+            return Response(
+                {'error': f'{total} predictions match; narrow the filters to at most {limit}{hint}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        contexts = [PredictionReportGenerator.report_context(p) for p in predictions]
+        
+        if output == 'zip':
+            response = StreamingHttpResponse(
+                PredictionReportGenerator.stream_cohort_zip(
+                    contexts, lambda func, items: get_render_pool().map(func, items, chunksize=8)
+                ),
+                content_type='application/zip'
+            )
+            response['Content-Disposition'] = 'attachment; filename="prediction_reports.zip"'
+            return response
+        
+        response = HttpResponse(
+            get_render_pool().submit(render_cohort_pdf_bytes, contexts).result(),
+            content_type='application/pdf'
+        )
+        response['Content-Disposition'] = 'attachment; filename="prediction_reports.pdf"'
+        return response
+    
+    @action(detail=False, methods=['get'])
+    def latest(self, request):
+        """Current prediction for each student and semester, with the usual list filters"""
+        latest = self.paginate_queryset(self.get_queryset().current())
+        return self.get_paginated_response(self.get_serializer(latest, many=True).data)
+    
     @action(detail=False, methods=['get'])
     def at_risk(self, request):
         """Get all at-risk students"""
-        at_risk = Prediction.objects.filter(risk_level='at_risk').order_by('-predicted_at')
-        return Response(PredictionSerializer(at_risk, many=True).data)
+        at_risk = self.paginate_queryset(
+            self.get_queryset().current().filter(risk_level='at_risk')
+        )
+        return self.get_paginated_response(self.get_serializer(at_risk, many=True).data)
 
 class InterventionViewSet(viewsets.ModelViewSet):
     queryset = Intervention.objects.all()
     serializer_class = InterventionSerializer
     permission_classes = [IsAuthenticated]
 
+class PredictionJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Status and progress of bulk prediction jobs"""
+    queryset = PredictionJob.objects.all()
+    serializer_class = PredictionJobSerializer
+    permission_classes = [IsAuthenticated]
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def generate_report(request, pk):
-    """Generate PDF report for a prediction"""
+    """Generate PDF report for a prediction in the background, or return the cached one"""
     try:
-        prediction = Prediction.objects.get(pk=pk)
-        pdf_path = PredictionReportGenerator.generate_report(prediction)
+        prediction = Prediction.objects.select_related('student').get(pk=pk)
+        report = submit_report(prediction)
         
+        if report['status'] == 'ready':
+            return Response({
+                'message': 'Report generated successfully',
+                **report
+            })
         return Response({
-            'message': 'Report generated successfully',
-            'file_path': pdf_path
-        })
+            'message': 'Report generation started',
+            **report
+        }, status=status.HTTP_202_ACCEPTED)
     except Prediction.DoesNotExist:
         return Response({'error': 'Prediction not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def report_status(request, pk):
+    """Check whether a prediction's PDF report is ready"""
+    try:
+        prediction = Prediction.objects.select_related('student').get(pk=pk)
+        return Response(get_report_status(prediction))
+    except Prediction.DoesNotExist:
+        return Response({'error': 'Prediction not found'}, status=status.HTTP_404_NOT_FOUND)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def download_report(request, pk):
+    """Stream a prediction's PDF report, rendering it in memory if it is not cached"""
+    try:
+        prediction = Prediction.objects.select_related('student').prefetch_related('interventions').get(pk=pk)
+    except Prediction.DoesNotExist:
+        return Response({'error': 'Prediction not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    response = HttpResponse(
+        PredictionReportGenerator.generate_report_bytes(prediction),
+        content_type='application/pdf'
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="prediction_report_{prediction.student.student_id}_{prediction.pk}.pdf"'
+    )
+    return response
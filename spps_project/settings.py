@@ -29,12 +29,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -59,12 +62,101 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'spps_project.wsgi.application'
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite unless DB_ENGINE=postgresql (needs the psycopg driver the Dockerfile installs);
+# connections persist for DB_CONN_MAX_AGE seconds and are health-checked before reuse
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'spps'),
+            'USER': os.environ.get('DB_USER', 'spps'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            # DB_POOLER=pgbouncer: PgBouncer in transaction mode cannot keep server-side cursors open
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_POOLER') == 'pgbouncer',
+            'OPTIONS': {
+                'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+                'options': f"-c statement_timeout={int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0))}",
+            },
+        }
     }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Seconds a writer waits on the database lock before "database is locked"
+                'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)),
+            },
+        }
+    }
+
+# Optional read replica: set DB_REPLICA_HOST (PostgreSQL) or DB_REPLICA_NAME (a SQLite file
+# kept in sync with the primary). core.routers sends read-only requests to it.
+if os.environ.get('DB_REPLICA_HOST') or os.environ.get('DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'HOST': os.environ.get('DB_REPLICA_HOST', DATABASES['default'].get('HOST', '')),
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default'].get('PORT', '')),
+        'USER': os.environ.get('DB_REPLICA_USER', DATABASES['default'].get('USER', '')),
+        'PASSWORD': os.environ.get('DB_REPLICA_PASSWORD', DATABASES['default'].get('PASSWORD', '')),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.routers.ReadReplicaRouter']
+# Seconds a client keeps reading from the primary after a write request
+DATABASE_REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5))
+
+# Applied to every new SQLite connection by core.db. synchronous=NORMAL is safe under WAL.
+SQLITE_PRAGMAS = {
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)) * 1000,
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'cache_size': -int(os.environ.get('SQLITE_CACHE_KB', 64 * 1024)),
+    'temp_store': 'MEMORY',
 }
+# SQLITE_JOURNAL_MODE=WAL lets readers carry on while an import writes. It is opt-in because
+# the mode is stored in the database file: any manage.py run would rewrite a checked-in db.sqlite3.
+if os.environ.get('SQLITE_JOURNAL_MODE'):
+    SQLITE_PRAGMAS = {'journal_mode': os.environ['SQLITE_JOURNAL_MODE'], **SQLITE_PRAGMAS}
+
+# Cache used by core.cache. Local memory is private to each worker process; set
+# REDIS_URL (any Redis-protocol server; needs the redis package) to share one cache.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+            'KEY_PREFIX': os.environ.get('CACHE_KEY_PREFIX', 'spps'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'spps',
+            'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 20000))},
+        }
+    }
+
+# Signal-driven invalidation only reaches the cache of the process that saw the change. With the
+# per-process default, other workers serve their copies until they expire, so entries are kept
+# briefly; a shared Redis cache is invalidated for every worker and keeps them much longer.
+CACHE_IS_SHARED = bool(os.environ.get('REDIS_URL'))
+STUDENT_CACHE_TIMEOUT = int(os.environ.get('STUDENT_CACHE_TIMEOUT', 24 * 60 * 60 if CACHE_IS_SHARED else 30))
+DASHBOARD_STATS_CACHE_TIMEOUT = int(os.environ.get('DASHBOARD_STATS_CACHE_TIMEOUT', 300 if CACHE_IS_SHARED else 30))
+PREDICTION_STATISTICS_CACHE_TIMEOUT = int(
+    os.environ.get('PREDICTION_STATISTICS_CACHE_TIMEOUT', 300 if CACHE_IS_SHARED else 30)
+)
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -94,6 +186,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.IdCursorPagination',
+    'PAGE_SIZE': int(os.environ.get('API_PAGE_SIZE', 50)),
 }
 
 # CORS_ALLOW_ALL_ORIGINS = True
@@ -117,3 +211,27 @@ SESSION_COOKIE_SECURE = False
 CSRF_COOKIE_SECURE = False
 
 AUTH_USER_MODEL = 'authentication.CustomUser'
+
+# Per-view request metrics, served at /api/metrics/ (core.middleware.RequestMetricsMiddleware)
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+# Log queries slower than this many milliseconds, with SQL and call site; unset to disable
+METRICS_SLOW_QUERY_MS = (
+    float(os.environ['METRICS_SLOW_QUERY_MS']) if os.environ.get('METRICS_SLOW_QUERY_MS') else None
+)
+
+# Profiling of the engine, CSV import and report code paths (core.profiling).
+# PROFILING_ENABLED profiles every call; otherwise requests opt in with an X-Profile header.
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+PROFILING_CPROFILE = os.environ.get('PROFILING_CPROFILE', 'false').lower() == 'true'
+PROFILING_ALLOW_HEADER = os.environ.get('PROFILING_ALLOW_HEADER', str(DEBUG)).lower() == 'true'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'spps.slow_queries': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
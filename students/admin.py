@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Student, Course, Result, AdditionalFactors
+from .models import Student, Course, Result, AdditionalFactors, StudentSemesterSummary
 
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
@@ -20,3 +20,9 @@ class ResultAdmin(admin.ModelAdmin):
 @admin.register(AdditionalFactors)
 class AdditionalFactorsAdmin(admin.ModelAdmin):
     list_display = ['student', 'attendance_percentage', 'assignment_average']
+
+@admin.register(StudentSemesterSummary)
+class StudentSemesterSummaryAdmin(admin.ModelAdmin):
+    list_display = ['student', 'semester', 'course_count', 'gpa', 'cumulative_cgpa']
+    list_filter = ['semester']
+    search_fields = ['student__student_id']
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from students.models import Student, StudentSemesterSummary
+
+class Command(BaseCommand):
+    help = 'Rebuild per-semester GPA summaries from the results table'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'student_ids', nargs='*',
+            help='Only rebuild these students (defaults to everyone)'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+    
+    def handle(self, *args, **options):
+        student_pks = None
+        if options['student_ids']:
+            student_pks = list(
+                Student.objects.filter(student_id__in=options['student_ids'])
+                .values_list('pk', flat=True)
+            )
+        
+        written = StudentSemesterSummary.rebuild(student_pks, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} semester summaries"))
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_summaries(apps, schema_editor):
+    Result = apps.get_model('students', 'Result')
+    StudentSemesterSummary = apps.get_model('students', 'StudentSemesterSummary')
+
+    totals = Result.objects.order_by().values('student_id', 'semester').annotate(
+        points=models.Sum('quality_points'),
+        credits=models.Sum('credit_units'),
+        courses=models.Count('id'),
+        first_recorded=models.Min('created_at'),
+    ).order_by('student_id', 'first_recorded', 'semester')
+
+    summaries = []
+    current_student = None
+    for row in totals.iterator():
+        if row['student_id'] != current_student:
+            current_student = row['student_id']
+            running_points, running_credits = 0.0, 0
+        running_points += row['points']
+        running_credits += row['credits']
+        summaries.append(StudentSemesterSummary(
+            student_id=row['student_id'],
+            semester=row['semester'],
+            total_quality_points=row['points'],
+            total_credit_units=row['credits'],
+            course_count=row['courses'],
+            gpa=round(row['points'] / row['credits'], 2) if row['credits'] > 0 else 0.0,
+            cumulative_cgpa=round(running_points / running_credits, 2) if running_credits > 0 else 0.0,
+        ))
+    StudentSemesterSummary.objects.bulk_create(summaries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentSemesterSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semester', models.CharField(max_length=20)),
+                ('total_quality_points', models.FloatField(default=0)),
+                ('total_credit_units', models.IntegerField(default=0)),
+                ('course_count', models.IntegerField(default=0)),
+                ('gpa', models.FloatField(default=0)),
+                ('cumulative_cgpa', models.FloatField(default=0, help_text='CGPA over this and all earlier semesters')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='semester_summaries', to='students.student')),
+            ],
+            options={
+                'db_table': 'student_semester_summaries',
+                'ordering': ['student', 'id'],
+                'unique_together': {('student', 'semester')},
+            },
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
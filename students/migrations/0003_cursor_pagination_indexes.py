@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0002_studentsemestersummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['student', 'id'], name='result_student_cursor_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:33
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0004_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='result',
+            name='result_student_semester_idx',
+        ),
+    ]
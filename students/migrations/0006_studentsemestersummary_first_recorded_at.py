@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+def backfill_first_recorded(apps, schema_editor):
+    Result = apps.get_model('students', 'Result')
+    StudentSemesterSummary = apps.get_model('students', 'StudentSemesterSummary')
+
+    first_recorded = {
+        (row['student_id'], row['semester']): row['first_recorded']
+        for row in Result.objects.order_by().values('student_id', 'semester').annotate(
+            first_recorded=models.Min('created_at'),
+        ).iterator()
+    }
+    summaries = list(StudentSemesterSummary.objects.all())
+    for summary in summaries:
+        summary.first_recorded_at = first_recorded.get((summary.student_id, summary.semester), summary.updated_at)
+    StudentSemesterSummary.objects.bulk_update(summaries, ['first_recorded_at'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0005_drop_redundant_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentsemestersummary',
+            name='first_recorded_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(backfill_first_recorded, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='studentsemestersummary',
+            name='first_recorded_at',
+            field=models.DateTimeField(help_text="When the semester's earliest result was recorded; orders semesters for cumulative_cgpa"),
+        ),
+    ]
@@ -1,4 +1,41 @@
-from django.db import models
+import re
+from collections import defaultdict
+from django.db import models, transaction
+from django.db.models import FloatField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Cast, NullIf
+
+def gpa_annotation_name(semester=None):
+    """Attribute name under which StudentQuerySet.with_gpa stores a GPA"""
+    if not semester:
+        return 'annotated_gpa'
+    return 'annotated_gpa_' + re.sub(r'\W', '_', semester).lower()
+
+class StudentQuerySet(models.QuerySet):
+    
+    def with_gpa(self, semesters=None):
+        """
+        Annotate the overall GPA, plus the GPA for each of `semesters`,
+        computed in SQL so calculate_gpa does not need to query results
+        """
+        annotations = {}
+        for semester in [None] + list(semesters or []):
+            summaries = StudentSemesterSummary.objects.filter(student=OuterRef('pk'))
+            if semester:
+                summaries = summaries.filter(semester=semester)
+            gpa = summaries.order_by().values('student').annotate(
+                gpa=Sum('total_quality_points') / Cast(
+                    NullIf(Sum('total_credit_units'), 0), FloatField()
+                )
+            ).values('gpa')
+            annotations[gpa_annotation_name(semester)] = Subquery(gpa, output_field=FloatField())
+        return self.annotate(**annotations)
+    
+    def with_details(self, results=True):
+        """Everything StudentSerializer reads, loaded up front"""
+        queryset = self.with_gpa(semesters=['First']).select_related('factors')
+        if results:
+            queryset = queryset.prefetch_related('results__course')
+        return queryset
 
 class Student(models.Model):
     student_id = models.CharField(max_length=50, unique=True)
@@ -11,23 +48,34 @@ class Student(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = StudentQuerySet.as_manager()
+    
     class Meta:
         db_table = 'students'
         ordering = ['student_id']
+        indexes = [
+            models.Index(fields=['department', 'admission_year'], name='student_department_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student_id} - {self.first_name} {self.last_name}"
     
     def calculate_gpa(self, semester=None):
-        results = self.results.all()
-        if semester:
-            results = results.filter(semester=semester)
+        annotation = gpa_annotation_name(semester)
+        if hasattr(self, annotation):
+            gpa = getattr(self, annotation)
+            return round(gpa, 2) if gpa is not None else 0.0
         
-        if not results.exists():
-            return 0.0
+        summaries = self.semester_summaries.all()
+        if semester:
+            summaries = summaries.filter(semester=semester)
         
-        total_points = sum(r.quality_points for r in results)
-        total_credits = sum(r.credit_units for r in results)
+        totals = summaries.aggregate(
+            total_points=Sum('total_quality_points'),
+            total_credits=Sum('total_credit_units')
+        )
+        total_points = totals['total_points'] or 0
+        total_credits = totals['total_credits'] or 0
         
         return round(total_points / total_credits, 2) if total_credits > 0 else 0.0
 
@@ -44,6 +92,10 @@ class Course(models.Model):
         return f"{self.course_code} - {self.course_title}"
 
 class Result(models.Model):
+    # Minimum score for each grade, highest first; anything lower is an F
+    GRADE_BOUNDARIES = [(70, 'A'), (60, 'B'), (50, 'C'), (45, 'D'), (40, 'E')]
+    GRADE_POINTS = {'A': 5, 'B': 4, 'C': 3, 'D': 2, 'E': 1, 'F': 0}
+    
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='results')
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     semester = models.CharField(max_length=20)
@@ -56,23 +108,43 @@ class Result(models.Model):
     class Meta:
         db_table = 'results'
         unique_together = ['student', 'course', 'semester']
+        indexes = [
+            # Cursor pagination of a single student's results
+            models.Index(fields=['student', 'id'], name='result_student_cursor_idx'),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._summary_state = instance.summary_state()
+        return instance
     
     def save(self, *args, **kwargs):
         self.grade = self.calculate_grade()
         self.quality_points = self.calculate_quality_points()
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'score', 'credit_units'} & set(update_fields):
+            # update_or_create only saves its defaults; keep the derived fields in step
+            kwargs['update_fields'] = set(update_fields) | {'grade', 'quality_points'}
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            StudentSemesterSummary.record_result_change(
+                getattr(self, '_summary_state', None), self.summary_state()
+            )
+        self._summary_state = self.summary_state()
+    
+    def summary_state(self):
+        """The values this result contributes to its StudentSemesterSummary"""
+        return (self.student_id, self.semester, self.quality_points, self.credit_units, self.created_at)
     
     def calculate_grade(self):
-        if self.score >= 70: return 'A'
-        elif self.score >= 60: return 'B'
-        elif self.score >= 50: return 'C'
-        elif self.score >= 45: return 'D'
-        elif self.score >= 40: return 'E'
-        else: return 'F'
+        for min_score, grade in self.GRADE_BOUNDARIES:
+            if self.score >= min_score:
+                return grade
+        return 'F'
     
     def calculate_quality_points(self):
-        grade_points = {'A': 5, 'B': 4, 'C': 3, 'D': 2, 'E': 1, 'F': 0}
-        return grade_points.get(self.grade, 0) * self.credit_units
+        return self.GRADE_POINTS.get(self.grade, 0) * self.credit_units
     
     def __str__(self):
         return f"{self.student.student_id} - {self.course.course_code}: {self.grade}"
@@ -96,3 +168,226 @@ class AdditionalFactors(models.Model):
     
     def __str__(self):
         return f"Factors for {self.student.student_id}"
+
+class StudentSemesterSummary(models.Model):
+    """
+    Running GPA totals per student and semester, maintained incrementally
+    from Result changes. Rebuild with `manage.py rebuild_gpa_summaries`.
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='semester_summaries')
+    semester = models.CharField(max_length=20)
+    total_quality_points = models.FloatField(default=0)
+    total_credit_units = models.IntegerField(default=0)
+    course_count = models.IntegerField(default=0)
+    gpa = models.FloatField(default=0)
+    cumulative_cgpa = models.FloatField(default=0, help_text="CGPA over this and all earlier semesters")
+    first_recorded_at = models.DateTimeField(
+        help_text="When the semester's earliest result was recorded; orders semesters for cumulative_cgpa"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'student_semester_summaries'
+        unique_together = ['student', 'semester']
+        ordering = ['student', 'id']
+    
+    def __str__(self):
+        return f"{self.student_id} - {self.semester}: {self.gpa}"
+    
+    @staticmethod
+    def compute_gpa(total_points, total_credits):
+        return round(total_points / total_credits, 2) if total_credits > 0 else 0.0
+    
+    @staticmethod
+    def new_delta():
+        """[quality_points, credit_units, course_count, earliest added, earliest removed created_at]"""
+        return [0.0, 0, 0, None, None]
+    
+    @staticmethod
+    def earliest(recorded_at, other):
+        return other if recorded_at is None or (other is not None and other < recorded_at) else recorded_at
+    
+    @classmethod
+    def record_result_change(cls, previous, current):
+        """
+        Apply the difference between two Result.summary_state() tuples;
+        either may be None for a created or deleted result
+        """
+        deltas = defaultdict(cls.new_delta)
+        if previous:
+            student_id, semester, quality_points, credit_units, created_at = previous
+            delta = deltas[(student_id, semester)]
+            delta[0] -= quality_points
+            delta[1] -= credit_units
+            delta[2] -= 1
+            delta[4] = created_at
+        if current:
+            student_id, semester, quality_points, credit_units, created_at = current
+            delta = deltas[(student_id, semester)]
+            delta[0] += quality_points
+            delta[1] += credit_units
+            delta[2] += 1
+            delta[3] = created_at
+        if previous and current and previous[:2] == current[:2]:
+            # Changed in place: the result is still recorded when it was
+            delta[3] = delta[4] = None
+        cls.apply_deltas(deltas)
+    
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """
+        Apply {(student_id, semester): new_delta()} changes, then refresh the GPA
+        and cumulative CGPA of every affected student from their summary rows.
+        Only removing a semester's earliest result looks at the results table.
+        """
+        deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+        if not deltas:
+            return
+        
+        student_ids = {student_id for student_id, _ in deltas}
+        with transaction.atomic():
+            rows = defaultdict(list)
+            for summary in cls.objects.select_for_update().filter(
+                student_id__in=student_ids
+            ).order_by('student_id', 'id'):
+                rows[summary.student_id].append(summary)
+            
+            existing = {
+                (summary.student_id, summary.semester): summary
+                for summaries in rows.values() for summary in summaries
+            }
+            
+            created = []
+            moved = []
+            for (student_id, semester), delta in deltas.items():
+                quality_points, credit_units, courses, added_at, removed_at = delta
+                summary = existing.get((student_id, semester))
+                if summary is None:
+                    if courses <= 0:
+                        continue
+                    summary = cls(student_id=student_id, semester=semester)
+                    rows[student_id].append(summary)
+                    created.append(summary)
+                summary.total_quality_points += quality_points
+                summary.total_credit_units += credit_units
+                summary.course_count += courses
+                summary.first_recorded_at = cls.earliest(summary.first_recorded_at, added_at)
+                lost_earliest = removed_at is not None and removed_at <= summary.first_recorded_at
+                if lost_earliest and summary.course_count > 0:
+                    # The earliest result went; the next one is only known to the results table
+                    moved.append(summary)
+            
+            if moved:
+                cls._refresh_first_recorded(moved)
+            
+            updated = []
+            emptied = []
+            for student_id in student_ids:
+                remaining = []
+                for summary in rows[student_id]:
+                    if summary.course_count <= 0:
+                        if summary.pk:
+                            emptied.append(summary.pk)
+                    else:
+                        remaining.append(summary)
+                cls._compute_cumulative(remaining)
+                updated.extend(summary for summary in remaining if summary.pk)
+            
+            if emptied:
+                cls.objects.filter(pk__in=emptied).delete()
+            cls.objects.bulk_update(updated, [
+                'total_quality_points', 'total_credit_units', 'course_count',
+                'gpa', 'cumulative_cgpa', 'first_recorded_at'
+            ], batch_size=500)
+            cls.objects.bulk_create(created, batch_size=500)
+        
+        cls.send_changed(student_ids)
+    
+    @classmethod
+    def send_changed(cls, student_ids):
+        """Announce changed summaries; student_ids is None after a full rebuild"""
+        from .signals import semester_summaries_changed
+        semester_summaries_changed.send(sender=cls, student_ids=student_ids)
+    
+    @classmethod
+    def _refresh_first_recorded(cls, summaries):
+        """Look up first_recorded_at again for summaries that lost their earliest result"""
+        keys = Q()
+        for summary in summaries:
+            keys |= Q(student_id=summary.student_id, semester=summary.semester)
+        first_recorded = {
+            (row['student_id'], row['semester']): row['first_recorded']
+            for row in Result.objects.filter(keys).order_by().values('student_id', 'semester').annotate(
+                first_recorded=models.Min('created_at')
+            )
+        }
+        for summary in summaries:
+            summary.first_recorded_at = first_recorded[(summary.student_id, summary.semester)]
+    
+    @staticmethod
+    def semester_order(summary):
+        """Sort key of one student's summaries: when each semester was first recorded, then name"""
+        return (summary.first_recorded_at, summary.semester)
+    
+    @classmethod
+    def _compute_cumulative(cls, summaries):
+        """Set gpa and cumulative_cgpa on one student's summaries, sorting them into semester order"""
+        summaries.sort(key=cls.semester_order)
+        running_points = 0.0
+        running_credits = 0
+        for summary in summaries:
+            running_points += summary.total_quality_points
+            running_credits += summary.total_credit_units
+            summary.gpa = cls.compute_gpa(summary.total_quality_points, summary.total_credit_units)
+            summary.cumulative_cgpa = cls.compute_gpa(running_points, running_credits)
+    
+    @classmethod
+    def rebuild(cls, student_ids=None, batch_size=1000):
+        """
+        Recompute summaries from the results table. Returns the number of rows written.
+        """
+        results = Result.objects.all()
+        summaries = cls.objects.all()
+        if student_ids is not None:
+            results = results.filter(student_id__in=student_ids)
+            summaries = summaries.filter(student_id__in=student_ids)
+        
+        totals = results.order_by().values('student_id', 'semester').annotate(
+            points=Sum('quality_points'),
+            credits=Sum('credit_units'),
+            courses=models.Count('id'),
+            first_recorded=models.Min('created_at')
+        ).order_by('student_id')
+        
+        written = 0
+        with transaction.atomic():
+            summaries.delete()
+            
+            batch = []
+            current_student = None
+            student_rows = []
+            for row in totals.iterator():
+                if row['student_id'] != current_student:
+                    cls._compute_cumulative(student_rows)
+                    batch.extend(student_rows)
+                    current_student = row['student_id']
+                    student_rows = []
+                    if len(batch) >= batch_size:
+                        cls.objects.bulk_create(batch)
+                        written += len(batch)
+                        batch = []
+                student_rows.append(cls(
+                    student_id=row['student_id'],
+                    semester=row['semester'],
+                    total_quality_points=row['points'],
+                    total_credit_units=row['credits'],
+                    course_count=row['courses'],
+                    first_recorded_at=row['first_recorded']
+                ))
+            cls._compute_cumulative(student_rows)
+            batch.extend(student_rows)
+            cls.objects.bulk_create(batch)
+            written += len(batch)
+        
+        cls.send_changed(student_ids)
+        return written
@@ -1,5 +1,7 @@
+from django.db import models
 from rest_framework import serializers
-from .models import Student, Course, Result, AdditionalFactors
+from core.cache import COURSES, cached_for_student, cached_for_students
+from .models import Student, Course, Result, AdditionalFactors, gpa_annotation_name
 
 class CourseSerializer(serializers.ModelSerializer):
     class Meta:
@@ -19,7 +21,29 @@ class AdditionalFactorsSerializer(serializers.ModelSerializer):
         model = AdditionalFactors
         fields = '__all__'
 
+class StudentListSerializer(serializers.ListSerializer):
+    """Reads a page of student payloads from the cache in one batch"""
+    
+    def to_representation(self, data):
+        students = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        if any(student.pk is None for student in students):
+            return super().to_representation(students)
+        by_pk = {student.pk: student for student in students}
+        return cached_for_students(
+            'student_payload', [student.pk for student in students],
+            lambda pks: [
+                self.child.build_representation(student)
+                for student in self.child.load_details([by_pk[pk] for pk in pks])
+            ],
+            parts=[type(self.child).__name__], depends_on=[COURSES]
+        )
+
 class StudentSerializer(serializers.ModelSerializer):
+    """
+    The payload is cached per student and dropped when the student, their
+    results or factors change, or when any course changes. Plain Student rows
+    are enough: GPAs, factors and results are only loaded for cache misses.
+    """
     current_gpa = serializers.SerializerMethodField()
     first_semester_gpa = serializers.SerializerMethodField()
     results = ResultSerializer(many=True, read_only=True)
@@ -28,6 +52,29 @@ class StudentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Student
         fields = '__all__'
+        list_serializer_class = StudentListSerializer
+    
+    def to_representation(self, instance):
+        if instance.pk is None:
+            return self.build_representation(instance)
+        return cached_for_student(
+            'student_payload', instance.pk,
+            lambda: self.build_representation(self.load_details([instance])[0]),
+            parts=[type(self).__name__], depends_on=[COURSES]
+        )
+    
+    def load_details(self, students):
+        """`students` as Student.objects.with_details() loads them, reusing any already loaded that way"""
+        def loaded(student):
+            return hasattr(student, gpa_annotation_name())
+        missing = [student.pk for student in students if not loaded(student)]
+        if not missing:
+            return students
+        details = Student.objects.with_details(results='results' in self.fields).in_bulk(missing)
+        return [student if loaded(student) else details[student.pk] for student in students]
+    
+    def build_representation(self, instance):
+        return super().to_representation(instance)
     
     def get_current_gpa(self, obj):
         return obj.calculate_gpa()
@@ -35,6 +82,10 @@ class StudentSerializer(serializers.ModelSerializer):
     def get_first_semester_gpa(self, obj):
         return obj.calculate_gpa(semester='First')
 
+class StudentSummarySerializer(StudentSerializer):
+    """StudentSerializer without the nested results"""
+    results = None
+
 class CSVUploadSerializer(serializers.Serializer):
     file = serializers.FileField()
     semester = serializers.CharField(max_length=20)
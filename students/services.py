@@ -1,58 +1,104 @@
+import os
+import re
+import numpy as np
 import pandas as pd
+from collections import defaultdict
+from django.conf import settings
 from django.db import transaction
-from .models import Student, Course, Result
+from django.utils import timezone
+from core.cache import invalidate_students
+from core.profiling import profiled, stage
+from .models import Student, Course, Result, StudentSemesterSummary
+
+ERROR_FILE_ID_PATTERN = re.compile(r'^[\w.-]+$')
+
+def import_errors_dir():
+    return os.path.join(settings.MEDIA_ROOT, 'import_errors')
+
+def import_error_path(error_file_id):
+    """Path of a spilled error file, or None if the id is invalid or missing"""
+    if not ERROR_FILE_ID_PATTERN.match(error_file_id):
+        return None
+    path = os.path.join(import_errors_dir(), f"{error_file_id}.txt")
+    return path if os.path.exists(path) else None
+
+class ImportErrorLog:
+    """
+    Collects import errors, keeping at most `limit` in memory. Once the limit
+    is passed every error, including the ones already kept, is written to a
+    file under MEDIA_ROOT/import_errors so memory use stays flat.
+    """
+    
+    def __init__(self, limit):
+        self.limit = limit
+        self.errors = []
+        self.count = 0
+        self.path = None
+        self._file = None
+    
+    def extend(self, errors):
+        for error in errors:
+            self.count += 1
+            if self.count <= self.limit:
+                self.errors.append(error)
+                continue
+            if self._file is None:
+                self._open_spill_file()
+            self._file.write(error + '\n')
+    
+    @property
+    def file_id(self):
+        """Id of the spill file for import_error_path, or None if nothing spilled"""
+        return os.path.splitext(os.path.basename(self.path))[0] if self.path else None
+    
+    def _open_spill_file(self):
+        directory = import_errors_dir()
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(
+            directory, f"results_import_{timezone.now().strftime('%Y%m%d_%H%M%S_%f')}.txt"
+        )
+        self._file = open(self.path, 'w')
+        self._file.writelines(error + '\n' for error in self.errors)
+    
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
 
 class CSVImportService:
     
-    @staticmethod
-    def process_results_csv(file, semester):
+    REQUIRED_COLUMNS = ['student_id', 'course_code', 'score', 'credit_units']
+    OPTIONAL_COLUMNS = ['course_title']
+    CSV_DTYPES = {'student_id': str, 'course_code': str, 'course_title': str}
+    
+    # Rows written per bulk INSERT ... ON CONFLICT statement
+    BATCH_SIZE = 1000
+    
+    # Streaming mode: rows read and committed per chunk, errors kept in the response,
+    # and the upload size above which the upload_csv endpoint streams
+    CHUNK_SIZE = getattr(settings, 'CSV_IMPORT_CHUNK_SIZE', 20000)
+    MAX_REPORTED_ERRORS = getattr(settings, 'CSV_IMPORT_MAX_REPORTED_ERRORS', 1000)
+    STREAMING_THRESHOLD = getattr(settings, 'CSV_IMPORT_STREAMING_THRESHOLD', 10 * 1024 * 1024)
+    
+    @classmethod
+    @profiled('process_results_csv')
+    def process_results_csv(cls, file, semester, batch_size=None):
         """
         Process uploaded CSV file containing student results
         Expected columns: student_id, course_code, score, credit_units
         """
         try:
-            df = pd.read_csv(file)
+            with stage('parse'):
+                df = pd.read_csv(file, dtype=cls.CSV_DTYPES)
             
-            required_columns = ['student_id', 'course_code', 'score', 'credit_units']
-            if not all(col in df.columns for col in required_columns):
+            if not all(col in df.columns for col in cls.REQUIRED_COLUMNS):
                 return {
                     'success': False,
-                    'error': f'Missing required columns. Expected: {", ".join(required_columns)}'
+                    'error': f'Missing required columns. Expected: {", ".join(cls.REQUIRED_COLUMNS)}'
                 }
             
-            results_created = 0
-            errors = []
-            
             with transaction.atomic():
-                for index, row in df.iterrows():
-                    try:
-                        student = Student.objects.get(student_id=row['student_id'])
-                        course, _ = Course.objects.get_or_create(
-                            course_code=row['course_code'],
-                            defaults={
-                                'course_title': row.get('course_title', f'Course {row["course_code"]}'),
-                                'credit_units': int(row['credit_units']),
-                                'department': student.department
-                            }
-                        )
-                        
-                        result, created = Result.objects.update_or_create(
-                            student=student,
-                            course=course,
-                            semester=semester,
-                            defaults={
-                                'score': float(row['score']),
-                                'credit_units': int(row['credit_units'])
-                            }
-                        )
-                        
-                        if created:
-                            results_created += 1
-                            
-                    except Student.DoesNotExist:
-                        errors.append(f"Row {index + 1}: Student {row['student_id']} not found")
-                    except Exception as e:
-                        errors.append(f"Row {index + 1}: {str(e)}")
+                results_created, errors = cls.import_frame(df, semester, batch_size or cls.BATCH_SIZE)
             
             return {
                 'success': True,
@@ -60,9 +106,254 @@ class CSVImportService:
                 'total_processed': len(df),
                 'errors': errors
             }
+        
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Failed to process CSV: {str(e)}'
+            }
+    
+    @classmethod
+    def process_results_csv_streaming(cls, file, semester, chunksize=None, batch_size=None,
+                                      max_errors=None):
+        """
+        Import a large results CSV in fixed-size chunks, each committed in its
+        own transaction. A failing chunk is reported and skipped; chunks that
+        were already committed are kept.
+        """
+        error_log = ImportErrorLog(max_errors or cls.MAX_REPORTED_ERRORS)
+        results_created = 0
+        total_processed = 0
+        failed_chunks = 0
+        
+        try:
+            # Checked up front: a file with only a header yields no chunks to check
+            columns = pd.read_csv(file, nrows=0).columns
+            if not all(col in columns for col in cls.REQUIRED_COLUMNS):
+                return {
+                    'success': False,
+                    'error': f'Missing required columns. Expected: {", ".join(cls.REQUIRED_COLUMNS)}'
+                }
+            file.seek(0)
+            
+            reader = pd.read_csv(
+                file,
+                chunksize=chunksize or cls.CHUNK_SIZE,
+                dtype=cls.CSV_DTYPES,
+                usecols=lambda column: column in cls.REQUIRED_COLUMNS + cls.OPTIONAL_COLUMNS
+            )
             
+            for chunk in reader:
+                if chunk.empty:
+                    continue
+                
+                total_processed += len(chunk)
+                try:
+                    with transaction.atomic():
+                        created, errors = cls.import_frame(chunk, semester, batch_size or cls.BATCH_SIZE)
+                    results_created += created
+                    error_log.extend(errors)
+                except Exception as e:
+                    failed_chunks += 1
+                    error_log.extend([
+                        f"Rows {chunk.index[0] + 1}-{chunk.index[-1] + 1}: chunk not imported: {str(e)}"
+                    ])
+            
+            return {
+                'success': True,
+                'results_created': results_created,
+                'total_processed': total_processed,
+                'failed_chunks': failed_chunks,
+                'errors': error_log.errors,
+                'error_count': error_log.count,
+                'error_file_id': error_log.file_id
+            }
+        
         except Exception as e:
             return {
                 'success': False,
                 'error': f'Failed to process CSV: {str(e)}'
             }
+        finally:
+            error_log.close()
+    
+    @classmethod
+    def import_frame(cls, df, semester, batch_size):
+        """
+        Upsert the results in a DataFrame using set-based queries.
+        Row numbers in error messages come from the frame's index.
+        Returns: (results_created, errors)
+        """
+        errors = {}
+        
+        with stage('fetch'):
+            students = {
+                student.student_id: student
+                for student in Student.objects.only('id', 'student_id', 'department').in_bulk(
+                    df['student_id'].dropna().unique().tolist(), field_name='student_id'
+                ).values()
+            }
+        
+        with stage('normalize'):
+            student_found = df['student_id'].isin(students.keys())
+            for index, student_id in df.loc[~student_found, 'student_id'].items():
+                errors[index] = f"Row {index + 1}: Student {student_id} not found"
+            
+            credit_units, credit_errors = cls._convert_column(df['credit_units'], int)
+            scores, score_errors = cls._convert_column(df['score'], float)
+            
+            # Checks run in the same order the row-by-row importer used
+            for index in df.index[student_found]:
+                if index in credit_errors:
+                    errors[index] = f"Row {index + 1}: {credit_errors[index]}"
+                elif pd.isna(df.at[index, 'course_code']):
+                    errors[index] = f"Row {index + 1}: course_code is missing"
+                elif index in score_errors:
+                    errors[index] = f"Row {index + 1}: {score_errors[index]}"
+        
+        with stage('fetch'):
+            with_course = student_found & df['course_code'].notna() & ~df.index.isin(list(credit_errors))
+            courses = cls._resolve_courses(df[with_course], credit_units, students)
+        
+        with stage('normalize'):
+            valid = df.loc[with_course & ~df.index.isin(list(score_errors)), ['student_id', 'course_code']]
+            valid = valid.assign(
+                student_pk=valid['student_id'].map(lambda student_id: students[student_id].pk),
+                course_pk=valid['course_code'].map(lambda code: courses[code].pk),
+                score=scores[valid.index],
+                credit_units=credit_units[valid.index]
+            )
+            # Later rows for the same course overwrite earlier ones, as update_or_create did
+            valid = valid.drop_duplicates(subset=['student_pk', 'course_pk'], keep='last')
+            valid['grade'] = cls.calculate_grades(valid['score'])
+            valid['quality_points'] = valid['grade'].map(Result.GRADE_POINTS) * valid['credit_units']
+        
+        results_created = 0
+        with stage('persist'):
+            for start in range(0, len(valid), batch_size):
+                results_created += cls._upsert_results(valid.iloc[start:start + batch_size], semester)
+        
+        return results_created, [errors[index] for index in sorted(errors)]
+    
+    @staticmethod
+    def calculate_grades(scores):
+        """Vectorized Result.calculate_grade"""
+        boundaries = Result.GRADE_BOUNDARIES
+        return pd.Series(
+            np.select([scores >= min_score for min_score, _ in boundaries],
+                      [grade for _, grade in boundaries], default='F'),
+            index=scores.index
+        )
+    
+    @staticmethod
+    def _convert_column(series, converter):
+        """
+        Convert a column with int() or float() semantics.
+        Returns: (converted values, {index: error message})
+        """
+        if pd.api.types.is_numeric_dtype(series):
+            values = series.astype(float)
+            invalid = ~np.isfinite(values)
+            if converter is int:
+                values = np.trunc(values)
+        else:
+            def convert(value):
+                try:
+                    return float(converter(value))
+                except (TypeError, ValueError, OverflowError):
+                    return np.nan
+            values = series.map(convert).astype(float)
+            invalid = ~np.isfinite(values)
+        
+        errors = {}
+        for index, value in series[invalid].items():
+            try:
+                converter(value)
+                errors[index] = f"{series.name} is missing"
+            except (TypeError, ValueError, OverflowError) as e:
+                errors[index] = str(e)
+        return values, errors
+    
+    @classmethod
+    def _resolve_courses(cls, df, credit_units, students):
+        """Look up every course code in `df`, creating missing ones in bulk"""
+        codes = df['course_code'].unique().tolist()
+        courses = Course.objects.in_bulk(codes, field_name='course_code')
+        
+        missing = df[~df['course_code'].isin(courses.keys())].drop_duplicates('course_code')
+        if len(missing):
+            titles = missing['course_title'] if 'course_title' in missing.columns else None
+            Course.objects.bulk_create([
+                Course(
+                    course_code=code,
+                    course_title=(
+                        titles[index] if titles is not None and pd.notna(titles[index])
+                        else f'Course {code}'
+                    ),
+                    credit_units=int(credit_units[index]),
+                    department=students[student_id].department
+                )
+                for index, code, student_id in zip(
+                    missing.index, missing['course_code'], missing['student_id']
+                )
+            ], ignore_conflicts=True)
+            courses = Course.objects.in_bulk(codes, field_name='course_code')
+        
+        return courses
+    
+    @classmethod
+    def _upsert_results(cls, batch, semester):
+        """Write one batch of results and apply the GPA summary deltas; returns rows created"""
+        existing = {
+            (student_pk, course_pk): (quality_points, credit_units)
+            for student_pk, course_pk, quality_points, credit_units in Result.objects.filter(
+                semester=semester,
+                student_id__in=set(batch['student_pk']),
+                course_id__in=set(batch['course_pk'])
+            ).values_list('student_id', 'course_id', 'quality_points', 'credit_units')
+        }
+        
+        results = []
+        new_results = []
+        deltas = defaultdict(StudentSemesterSummary.new_delta)
+        created = 0
+        for row in batch.itertuples(index=False):
+            student_pk, course_pk = int(row.student_pk), int(row.course_pk)
+            result = Result(
+                student_id=student_pk,
+                course_id=course_pk,
+                semester=semester,
+                score=float(row.score),
+                grade=row.grade,
+                credit_units=int(row.credit_units),
+                quality_points=float(row.quality_points)
+            )
+            results.append(result)
+            
+            delta = deltas[(student_pk, semester)]
+            previous = existing.get((student_pk, course_pk))
+            if previous is None:
+                created += 1
+                delta[2] += 1
+                new_results.append(result)
+            else:
+                delta[0] -= previous[0]
+                delta[1] -= previous[1]
+            delta[0] += result.quality_points
+            delta[1] += result.credit_units
+        
+        Result.objects.bulk_create(
+            results,
+            update_conflicts=True,
+            unique_fields=['student', 'course', 'semester'],
+            update_fields=['score', 'grade', 'credit_units', 'quality_points']
+        )
+        # created_at is only set once bulk_create has run pre_save
+        for result in new_results:
+            delta = deltas[(result.student_id, semester)]
+            delta[3] = StudentSemesterSummary.earliest(delta[3], result.created_at)
+        StudentSemesterSummary.apply_deltas(deltas)
+        # bulk_create sends no post_save, and a new score may leave the summaries unchanged
+        invalidate_students({student_pk for student_pk, _ in deltas})
+        
+        return created
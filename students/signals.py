@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete
+from django.dispatch import Signal, receiver
+from .models import Result, StudentSemesterSummary
+
+# Sent with `student_ids` after the semester summaries of those students change
+semester_summaries_changed = Signal()
+
+@receiver(post_delete, sender=Result)
+def remove_result_from_summary(sender, instance, **kwargs):
+    """Subtract a deleted result from its semester summary"""
+    previous = getattr(instance, '_summary_state', None) or instance.summary_state()
+    StudentSemesterSummary.record_result_change(previous, None)
@@ -0,0 +1,290 @@
+import io
+import tempfile
+from unittest import mock
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from core.tests import QueryPlanTestCase, seed
+from .models import Course, Result, Student, StudentSemesterSummary
+from .services import CSVImportService
+
+class QueryPlanTests(QueryPlanTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed(students=60)
+        cls.student = Student.objects.order_by('pk').first()
+    
+    def test_student_list(self):
+        self.assertIndexedQueries('/api/students/students/')
+    
+    def test_student_detail(self):
+        self.assertIndexedQueries(f'/api/students/students/{self.student.pk}/')
+    
+    def test_results_for_a_student(self):
+        self.assertIndexedQueries(f'/api/students/results/?student_id={self.student.student_id}')
+
+class SemesterSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.students = [
+            Student.objects.create(
+                student_id=f'SUM{n}', first_name='Sum', last_name=str(n), email=f'sum{n}@example.com',
+                department='Maths', admission_year=2022, admission_score=250
+            )
+            for n in range(2)
+        ]
+        cls.courses = [
+            Course.objects.create(
+                course_code=f'SUM{n}', course_title=f'Course {n}', credit_units=n + 2, department='Maths'
+            )
+            for n in range(4)
+        ]
+    
+    def add(self, student, course, semester, score):
+        return Result.objects.create(
+            student=student, course=course, semester=semester, score=score, credit_units=course.credit_units
+        )
+    
+    def summaries(self):
+        return sorted(
+            (summary.student_id, summary.semester, summary.total_quality_points, summary.total_credit_units,
+             summary.course_count, summary.gpa, summary.cumulative_cgpa, summary.first_recorded_at)
+            for summary in StudentSemesterSummary.objects.all()
+        )
+    
+    def assertMatchesRebuild(self):
+        incremental = self.summaries()
+        with transaction.atomic():
+            StudentSemesterSummary.rebuild()
+            rebuilt = self.summaries()
+            transaction.set_rollback(True)
+        self.assertEqual(incremental, rebuilt)
+    
+    def test_incremental_totals_match_a_rebuild(self):
+        first, second = self.students
+        
+        # Created: 'Second' is recorded before 'First', so its summary row has the lower id
+        opening = self.add(first, self.courses[0], 'Second', 75)
+        self.add(first, self.courses[1], 'First', 45)
+        self.add(first, self.courses[2], 'Second', 62)
+        self.add(second, self.courses[1], 'First', 38)
+        self.add(second, self.courses[3], 'Third', 91)
+        self.assertMatchesRebuild()
+        
+        # Imported: a bulk upsert adds a semester and updates an existing result
+        CSVImportService.process_results_csv(io.StringIO(
+            "student_id,course_code,score,credit_units\nSUM0,SUM0,40,2\nSUM1,SUM1,68,3\n"
+        ), 'Fourth')
+        CSVImportService.process_results_csv(io.StringIO(
+            "student_id,course_code,score,credit_units\nSUM0,SUM0,90,2\n"
+        ), 'Fourth')
+        self.assertMatchesRebuild()
+        
+        # Updated: a new score, and a result moved to another semester
+        result = Result.objects.get(student=second, course=self.courses[3])
+        result.score = 52
+        result.save()
+        moved = Result.objects.get(student=first, course=self.courses[1])
+        moved.semester = 'Third'
+        moved.save()
+        self.assertMatchesRebuild()
+        
+        # Deleted: 'Second' now starts after 'Third' although its row is older
+        self.add(first, self.courses[3], 'Third', 80)
+        Result.objects.get(pk=opening.pk).delete()
+        self.assertMatchesRebuild()
+        
+        # Cascaded: a course deletion removes results of both students
+        self.courses[1].delete()
+        self.assertMatchesRebuild()
+        second.delete()
+        self.assertMatchesRebuild()
+    
+    def test_deltas_do_not_read_the_results_table(self):
+        first = self.students[0]
+        self.add(first, self.courses[0], 'First', 75)
+        
+        with CaptureQueriesContext(connection) as captured:
+            self.add(first, self.courses[1], 'Second', 62)
+            result = Result.objects.get(student=first, course=self.courses[0])
+            result.score = 48
+            result.save()
+        
+        scans = [query['sql'] for query in captured if 'FROM "results"' in query['sql']]
+        # Only the get() above; applying the deltas reads summary rows alone
+        self.assertEqual(len(scans), 1)
+        self.assertMatchesRebuild()
+
+def import_row_by_row(file, semester):
+    """The per-row importer CSVImportService.import_frame replaced, kept as its reference"""
+    df = pd.read_csv(file)
+    results_created = 0
+    errors = []
+    with transaction.atomic():
+        for index, row in df.iterrows():
+            try:
+                student = Student.objects.get(student_id=row['student_id'])
+                course, _ = Course.objects.get_or_create(
+                    course_code=row['course_code'],
+                    defaults={
+                        'course_title': row.get('course_title', f'Course {row["course_code"]}'),
+                        'credit_units': int(row['credit_units']),
+                        'department': student.department
+                    }
+                )
+                result, created = Result.objects.update_or_create(
+                    student=student,
+                    course=course,
+                    semester=semester,
+                    defaults={
+                        'score': float(row['score']),
+                        'credit_units': int(row['credit_units'])
+                    }
+                )
+                if created:
+                    results_created += 1
+            except Student.DoesNotExist:
+                errors.append(f"Row {index + 1}: Student {row['student_id']} not found")
+            except Exception as e:
+                errors.append(f"Row {index + 1}: {str(e)}")
+    return {
+        'success': True,
+        'results_created': results_created,
+        'total_processed': len(df),
+        'errors': errors
+    }
+
+class CSVImportTests(TestCase):
+    CSV = """student_id,course_code,course_title,score,credit_units
+CSV0,CSV100,Algebra,71,3
+CSV1,CSV100,Algebra,48,3
+CSV0,CSV200,Statistics,abc,2
+CSV9,CSV100,Algebra,80,3
+CSV1,CSV900,Topology,66,4
+CSV1,CSV902,Ethics,fifty,2
+CSV0,CSV100,Algebra,59,3
+CSV1,CSV200,Statistics,91,x
+CSV9,CSV903,Rhetoric,70,2
+CSV1,CSV900,Topology,42,4
+CSV0,CSV200,Statistics,88,2
+"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        students = [
+            Student.objects.create(
+                student_id=f'CSV{n}', first_name='Csv', last_name=str(n), email=f'csv{n}@example.com',
+                department='Physics', admission_year=2021, admission_score=230
+            )
+            for n in range(2)
+        ]
+        for code, title, credit_units in [('CSV100', 'Algebra', 3), ('CSV200', 'Statistics', 2)]:
+            Course.objects.create(
+                course_code=code, course_title=title, credit_units=credit_units, department='Physics'
+            )
+        # An existing result the import updates rather than creates
+        Result.objects.create(
+            student=students[1], course=Course.objects.get(course_code='CSV200'), semester='First',
+            score=55, credit_units=2
+        )
+    
+    def import_state(self, importer):
+        """Run `importer` on CSV, returning its response and the rows it wrote, then roll back"""
+        with transaction.atomic():
+            response = importer(io.StringIO(self.CSV), 'First')
+            state = {
+                'response': response,
+                'results': sorted(Result.objects.values_list(
+                    'student__student_id', 'course__course_code', 'semester', 'score', 'grade',
+                    'credit_units', 'quality_points'
+                )),
+                'courses': sorted(Course.objects.values_list(
+                    'course_code', 'course_title', 'credit_units', 'department'
+                )),
+                'summaries': sorted(StudentSemesterSummary.objects.values_list(
+                    'student__student_id', 'semester', 'total_quality_points', 'total_credit_units',
+                    'course_count', 'gpa', 'cumulative_cgpa'
+                ))
+            }
+            transaction.set_rollback(True)
+        return state
+    
+    maxDiff = None
+    
+    def test_set_based_import_matches_row_by_row(self):
+        expected = self.import_state(import_row_by_row)
+        
+        for importer in (
+            CSVImportService.process_results_csv,
+            lambda file, semester: CSVImportService.process_results_csv(file, semester, batch_size=2),
+        ):
+            actual = self.import_state(importer)
+            self.assertEqual(actual, expected)
+        
+        self.assertEqual(expected['response']['results_created'], 4)
+        self.assertEqual(len(expected['response']['errors']), 5)
+    
+    def test_blank_cells_are_reported(self):
+        """The row-by-row importer failed on a blank score and created a course named 'nan'"""
+        response = CSVImportService.process_results_csv(io.StringIO(
+            "student_id,course_code,score,credit_units\nCSV0,CSV901,,2\nCSV0,,64,3\n"
+        ), 'First')
+        
+        self.assertEqual(response['errors'], ['Row 1: score is missing', 'Row 2: course_code is missing'])
+        self.assertEqual(response['results_created'], 0)
+        self.assertFalse(Course.objects.filter(course_code='nan').exists())
+
+class CSVStreamingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Student.objects.create(
+            student_id='STR0', first_name='Stream', last_name='0', email='stream0@example.com',
+            department='Physics', admission_year=2021, admission_score=230
+        )
+    
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model()(username='importer', is_staff=True))
+    
+    def stream(self, content, **options):
+        return CSVImportService.process_results_csv_streaming(io.StringIO(content), 'First', **options)
+    
+    def test_header_is_checked_without_rows(self):
+        response = self.stream("student_id,course_code,score\n")
+        self.assertFalse(response['success'])
+        self.assertIn('Missing required columns', response['error'])
+        
+        response = self.stream("student_id,course_code,score,credit_units\n")
+        self.assertTrue(response['success'])
+        self.assertEqual(response['total_processed'], 0)
+    
+    def test_spilled_errors_are_downloaded_by_id(self):
+        content = "student_id,course_code,score,credit_units\n" + ''.join(
+            f"MISSING{n},STR100,70,3\n" for n in range(5)
+        ) + "STR0,STR100,70,3\n"
+        upload = SimpleUploadedFile('results.csv', content.encode(), content_type='text/csv')
+        
+        with mock.patch.object(CSVImportService, 'STREAMING_THRESHOLD', 0), \
+                mock.patch.object(CSVImportService, 'MAX_REPORTED_ERRORS', 2):
+            response = self.client.post(
+                '/api/students/students/upload_csv/', {'file': upload, 'semester': 'First'}, format='multipart'
+            )
+        
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['results_created'], response.data['error_count']), (1, 5))
+        self.assertNotIn('error_file', response.data)
+        self.assertNotIn('/', response.data['error_file_id'])
+        
+        download = self.client.get(response.data['error_file_url'])
+        self.assertEqual(download.status_code, 200)
+        lines = b''.join(download.streaming_content).decode().splitlines()
+        self.assertEqual(lines, [f"Row {n + 1}: Student MISSING{n} not found" for n in range(5)])
+        
+        self.assertEqual(self.client.get('/api/students/students/import_errors/missing/').status_code, 404)
@@ -1,18 +1,24 @@
+import os
+from django.http import FileResponse
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.reverse import reverse
+from core.pagination import StudentCursorPagination
 from .models import Student, Course, Result, AdditionalFactors
 from .serializers import (
     StudentSerializer, CourseSerializer, ResultSerializer,
     AdditionalFactorsSerializer, CSVUploadSerializer
 )
-from .services import CSVImportService
+from .services import CSVImportService, import_error_path
 
 class StudentViewSet(viewsets.ModelViewSet):
+    # StudentSerializer loads GPAs, factors and results only for payloads missing from the cache
     queryset = Student.objects.all()
     serializer_class = StudentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = StudentCursorPagination
     
     @action(detail=False, methods=['post'])
     def upload_csv(self, request):
@@ -21,13 +27,35 @@ class StudentViewSet(viewsets.ModelViewSet):
             file = serializer.validated_data['file']
             semester = serializer.validated_data['semester']
             
-            result = CSVImportService.process_results_csv(file, semester)
+            if file.size > CSVImportService.STREAMING_THRESHOLD:
+                result = CSVImportService.process_results_csv_streaming(file, semester)
+            else:
+                result = CSVImportService.process_results_csv(file, semester)
+            
+            if result.get('error_file_id'):
+                result['error_file_url'] = reverse(
+                    'student-import-errors', args=[result['error_file_id']], request=request
+                )
             
             if result['success']:
                 return Response(result, status=status.HTTP_201_CREATED)
             return Response(result, status=status.HTTP_400_BAD_REQUEST)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['get'], url_path=r'import_errors/(?P<error_file_id>[\w.-]+)')
+    def import_errors(self, request, error_file_id=None):
+        """Download every error of a streamed CSV import that reported more than it returned"""
+        path = import_error_path(error_file_id)
+        if path is None:
+            return Response({'error': 'Error file not found'}, status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=os.path.basename(path))
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'gpa':
+            queryset = queryset.with_gpa(semesters=['First'])
+        return queryset
+    
     @action(detail=True, methods=['get'])
     def gpa(self, request, pk=None):
         student = self.get_object()
@@ -43,7 +71,7 @@ class CourseViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
 class ResultViewSet(viewsets.ModelViewSet):
-    queryset = Result.objects.all()
+    queryset = Result.objects.select_related('course')
     serializer_class = ResultSerializer
     permission_classes = [IsAuthenticated]
     